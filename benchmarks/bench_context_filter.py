@@ -0,0 +1,59 @@
+"""
+    Micro-benchmark: cost per log call of ContextFilter's record-based mode vs. the opt-in frame walk.
+
+    Usage: python benchmarks/bench_context_filter.py [calls]
+"""
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.filters import ContextFilter
+
+
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+
+
+def build_logger(name: str, walk_frames: bool) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = NullHandler()
+    handler.addFilter(ContextFilter(walk_frames=walk_frames))
+    logger.addHandler(handler)
+    return logger
+
+
+class Service:
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def work(self):
+        self.logger.debug("tick")
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    baseline = logging.getLogger("bench.baseline")
+    baseline.setLevel(logging.DEBUG)
+    baseline.propagate = False
+    baseline.addHandler(NullHandler())
+
+    results = {
+        "no filter": Service(baseline),
+        "record (default)": Service(build_logger("bench.record", walk_frames=False)),
+        "walk_frames": Service(build_logger("bench.frames", walk_frames=True)),
+    }
+
+    for mode, service in results.items():
+        seconds = min(timeit.repeat(service.work, number=calls, repeat=3))
+        print(f"{mode:<18} {seconds / calls * 1e6:8.2f} µs/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+    Benchmark: due-reminder and per-user queries as sent history grows.
+
+    Seeds the `reminders` table with mostly sent rows (plus a small pending tail) and times the hot queries after
+    each checkpoint. With the indexes declared on `Reminder` the query time should stay flat; pass --no-indexes
+    to see the sequential-scan baseline.
+
+    Usage: python benchmarks/bench_due_query.py [--rows 1000000] [--url sqlite:///benchmarks/results/bench_due_query.db] [--no-indexes]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select
+
+from base import Base
+from classes.reminder import Reminder
+import classes.idea  # noqa: F401  (registers the Idea mapper referenced by Reminder.idea)
+
+
+CHUNK = 50_000
+USERS = 5_000
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_URL = "sqlite:///" + os.path.join(RESULTS_DIR, "bench_due_query.db")
+
+
+def seed(connection, start: int, count: int, now: datetime) -> None:
+    rows = []
+    for i in range(start, start + count):
+        pending = random.random() < 0.01
+        rows.append({
+            "discord_user_id": str(random.randrange(USERS)),
+            "message": f"reminder {i}",
+            "remind_at": now + timedelta(minutes=random.randint(1, 60 * 24 * 30)) if pending
+                         else now - timedelta(minutes=random.randint(1, 60 * 24 * 365)),
+            "created_at": now,
+            "sent": not pending,
+            "list_id": i,
+        })
+    connection.execute(insert(Reminder), rows)
+
+
+def time_query(connection, stmt, repeat: int = 20) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(stmt).all()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--no-indexes", action="store_true")
+    args = parser.parse_args()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+
+    engine = create_engine(args.url)
+    Base.metadata.drop_all(engine, tables=[Reminder.__table__])
+    Base.metadata.create_all(engine, tables=[Reminder.__table__])
+    if args.no_indexes:
+        with engine.begin() as connection:
+            for index in Reminder.__table__.indexes:
+                index.drop(connection)
+
+    now = datetime.now(timezone.utc)
+    due_stmt = select(Reminder).where(Reminder.sent == False, Reminder.remind_at <= now + timedelta(hours=1))
+    user_stmt = (
+        select(Reminder)
+        .where(Reminder.discord_user_id == "42", Reminder.sent == False)
+        .order_by(Reminder.list_id)
+    )
+
+    checkpoints = sorted({c for c in (10_000, 100_000, 250_000, 500_000, args.rows) if c <= args.rows})
+    seeded = 0
+    print(f"{'rows':>10} {'due query (ms)':>16} {'user query (ms)':>16}")
+    for checkpoint in checkpoints:
+        with engine.begin() as connection:
+            while seeded < checkpoint:
+                count = min(CHUNK, checkpoint - seeded)
+                seed(connection, seeded, count, now)
+                seeded += count
+        with engine.connect() as connection:
+            print(f"{seeded:>10} {time_query(connection, due_stmt):>16.3f} {time_query(connection, user_stmt):>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+    Benchmark: per-parse latency of utils.time_parser.parse_time vs. calling dateparser for every input.
+
+    The corpus mirrors what users type into `/reminder set`. Reports the dateparser import cost, then the mean
+    latency per parse for each input over `rounds` passes.
+
+    Usage: python benchmarks/bench_time_parser.py [rounds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.time_parser import parse_time
+
+
+CORPUS = [
+    "in 1h", "1h", "30m", "in 30 minutes", "in 5 min", "10 mins", "2h30m", "in 2 hours and 15 minutes",
+    "1 day, 2 hours", "in 3 days", "1w", "90s", "tomorrow", "tomorrow 9am", "tomorrow at 17:30", "9am", "3pm",
+    "18:45", "2026-12-24T18:00:00Z", "2026-12-24 18:00", "friday", "in 1 month", "next week", "in 3 days at noon",
+]
+
+
+def time_per_parse(parse, text: str, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        parse(text)
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    started = time.perf_counter()
+    import dateparser
+    print(f"dateparser import: {(time.perf_counter() - started) * 1000:.1f} ms\n")
+
+    def with_dateparser(text):
+        return dateparser.parse(text, settings={"PREFER_DATES_FROM": "future"})
+
+    print(f"{'input':<28} {'parse_time (µs)':>16} {'dateparser (µs)':>16}")
+    totals = [0.0, 0.0]
+    for text in CORPUS:
+        fast = time_per_parse(parse_time, text, rounds)
+        slow = time_per_parse(with_dateparser, text, rounds)
+        totals[0] += fast
+        totals[1] += slow
+        print(f"{text!r:<28} {fast:>16.1f} {slow:>16.1f}")
+
+    print(f"{'mean':<28} {totals[0] / len(CORPUS):>16.1f} {totals[1] / len(CORPUS):>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,199 @@
+import hashlib
+import json
 import os
 import platform
+import re
 import time
 
 import config
 import discord
+from discord import app_commands
 from discord.ext import commands
 from colorama import Back, Fore, Style
-from commands.reminder import send_due_reminders
+from handlers.reminder_delivery import send_due_reminders, wait_for_pushes
+from classes.reminder import Reminder
+from handlers.reminder_dispatcher import reminder_dispatcher
+from utils.database import dispose_engines, ensure_schema
+from base import Base
+from datetime import timedelta
+from utils.send_push_notification import close_ntfy_client
+from utils import yt_extractor
+from utils.rabbitmq_publisher import RabbitPublisher
+from utils.prefect_config import prefect_config
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from handlers import scheduler, metrics
 import asyncio
 
-scheduler = AsyncIOScheduler()
-
 MY_GUILD = discord.Object(id=config.botConfig["hub-server-guild-id"])
 
+def discover_extensions(folder: str) -> list:
+    """Module paths of every file under `folder` that defines an extension `setup`, found without importing it."""
+    extensions = []
+    for foldername, subfolders, filenames in os.walk(folder):
+        for fileName in filenames:
+            if not fileName.endswith('.py'):
+                continue
+
+            path = os.path.join(foldername, fileName)
+            with open(path, encoding="utf-8") as f:
+                if not re.search(r"^(async\s+)?def setup\(", f.read(), re.MULTILINE):
+                    print(f"Ignoring {fileName}: 'setup' function not found.", flush=True)
+                    continue
+
+            # Construct the module path by removing the './' prefix
+            extensions.append(os.path.normpath(path)[:-3].replace(os.path.sep, '.'))
+    return extensions
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """Command tree that records how long each slash command handler takes."""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started"] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        observe_command(interaction, interaction.command, "error")
+        await super().on_error(interaction, error)
+
+def observe_command(interaction: discord.Interaction, command, status: str):
+    started = interaction.extras.get("started")
+    if started is not None and command is not None:
+        metrics.command_duration.observe(time.perf_counter() - started, command=command.qualified_name, status=status)
+
 class Client(commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
 
-        super().__init__(command_prefix='!-&%', intents=intents)
+        super().__init__(command_prefix='!-&%', intents=intents, tree_cls=InstrumentedCommandTree)
+        self.metrics_runner = None
+
+        self.publisher = RabbitPublisher(
+            queues=[config.config["RMQ_YT_DOWNLOAD_QUEUE"]],
+            host=config.config["RMQ_HOST"],
+            port=int(config.config["RMQ_PORT"])
+        )
+        metrics.registry.gauge(
+            "sphere_rabbitmq_buffered_messages", "Messages waiting for the broker to come back.",
+            lambda: {(): self.publisher.buffered}
+        )
+        metrics.registry.gauge(
+            "sphere_rabbitmq_rejected_messages", "Messages refused because the buffer was full.",
+            lambda: {(): self.publisher.rejected}
+        )
 
     async def setup_hook(self):
-        for foldername, subfolders, filenames in os.walk('./commands'):
-            for fileName in filenames:
-                if fileName.endswith('.py'):
-                    # Construct the module path by removing the './' prefix
-                    module_path = os.path.join(foldername, fileName)[2:-3].replace(os.path.sep, '.')
-
-                    try:
-                        # Dynamically import the module
-                        module = __import__(module_path, fromlist=['setup'])
-
-                        if hasattr(module, 'setup') and callable(getattr(module, 'setup')):
-                            await self.load_extension(module_path)
-                            print(f"Loaded extension: {module_path}", flush=True)
-                        else:
-                            print(f"Ignoring {fileName}: 'setup' function not found.", flush=True)
-                    except (AttributeError, ImportError) as e:
-                        print(f"Ignoring {fileName}: {e}", flush=True)
-                        # Handle the exception (file doesn't have the required setup or is not compatible)
+        timings = {}
+
+        phase_started = time.perf_counter()
+        # every Prefect block registered by the imported modules, fetched concurrently in one round
+        await prefect_config.load()
+        timings["prefect config"] = time.perf_counter() - phase_started
+
+        phase_started = time.perf_counter()
+        if config.config.get("METRICS_ENABLED", True):
+            self.metrics_runner = await metrics.start_server(
+                host=config.config.get("METRICS_HOST", "127.0.0.1"),
+                port=int(config.config.get("METRICS_PORT", 9108))
+            )
+        timings["metrics"] = time.perf_counter() - phase_started
+
+        phase_started = time.perf_counter()
+        await self.publisher.start()
+        timings["publisher"] = time.perf_counter() - phase_started
+
+        phase_started = time.perf_counter()
+        extensions = discover_extensions('./commands')
+        await asyncio.gather(*(self.load_extension_logged(module_path) for module_path in extensions))
+        timings["extensions"] = time.perf_counter() - phase_started
+
+        phase_started = time.perf_counter()
+        # creates missing tables/indexes; large production tables should use migrations/ instead
+        await ensure_schema(Base.metadata)
+        timings["schema"] = time.perf_counter() - phase_started
+
+        phase_started = time.perf_counter()
+        synced = await self.sync_tree_if_changed()
+        timings["tree sync" if synced else "tree sync (skipped)"] = time.perf_counter() - phase_started
+
+        phase_started = time.perf_counter()
+        self.start_background_jobs()
+        timings["jobs"] = time.perf_counter() - phase_started
+
+        print("Startup: " + " | ".join(f"{phase} {seconds:.3f}s" for phase, seconds in timings.items()), flush=True)
+
+    def start_background_jobs(self):
+        """Register scheduled jobs under stable ids and start delivery; runs once per process, not per gateway connect."""
+        # reminders are delivered event-driven; the database is only re-read on this slow interval
+        reminder_dispatcher.reconcile_interval = config.config.get("REMINDER_RECONCILE_SECONDS", 300)
+        reminder_dispatcher.pause()     # resumed by on_ready once the gateway is connected
+        reminder_dispatcher.start(
+            deliver=scheduler.timed("reminder_delivery", lambda: send_due_reminders(self)),
+            load_pending=Reminder.load_pending_remind_times
+        )
+
+        scheduler.register_job("reminder_reconcile", reminder_dispatcher.reconcile, 'interval', seconds=reminder_dispatcher.reconcile_interval)
+        scheduler.register_job(
+            "reminder_archive",
+            Reminder.archive_sent,
+            'interval',
+            hours=24,
+            kwargs={"older_than": timedelta(days=config.config.get("REMINDER_ARCHIVE_AFTER_DAYS", 30))}
+        )
+        scheduler.register_job("prefect_config_refresh", prefect_config.refresh, 'interval', seconds=prefect_config.ttl)
+        scheduler.start()
+
+    async def on_disconnect(self):
+        # DMs cannot go out reliably while the gateway is down; due deadlines wait in the dispatcher heap
+        reminder_dispatcher.pause()
+
+    async def on_resumed(self):
+        reminder_dispatcher.resume()
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        observe_command(interaction, command, "ok")
+
+    async def load_extension_logged(self, module_path: str):
+        try:
+            await self.load_extension(module_path)
+            print(f"Loaded extension: {module_path}", flush=True)
+        except commands.ExtensionError as e:
+            print(f"Ignoring {module_path}: {e}", flush=True)
+
+    async def sync_tree_if_changed(self) -> bool:
+        """Sync the guild command tree only if its schema differs from the last synced one."""
+        payload = []
+        for command in self.tree.get_commands(guild=MY_GUILD):
+            try:
+                payload.append(command.to_dict(self.tree))   # discord.py >= 2.4
+            except TypeError:
+                payload.append(command.to_dict())
+
+        tree_hash = hashlib.sha256(
+            json.dumps([MY_GUILD.id, sorted(payload, key=lambda c: c["name"])], sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+        hash_file = config.config.get("COMMAND_TREE_HASH_FILE", ".command_tree_hash")
+        if os.path.exists(hash_file):
+            with open(hash_file) as f:
+                if f.read().strip() == tree_hash:
+                    return False
 
         await self.tree.sync(guild=MY_GUILD)
+        with open(hash_file, "w") as f:
+            f.write(tree_hash)
+        return True
+
+    async def close(self):
+        await reminder_dispatcher.stop()
+        await dispose_engines()
+        await wait_for_pushes()
+        await close_ntfy_client()
+        yt_extractor.shutdown()
+        await self.publisher.close()
+        prefect_config.shutdown()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        await super().close()
 
     async def on_ready(self):
         prfx = (Back.BLACK + Fore.GREEN + time.strftime("%H:%M:%S UTC", time.gmtime()) + Back.RESET + Fore.WHITE + Style.BRIGHT)
@@ -50,10 +202,9 @@ class Client(commands.Bot):
         print(f"{prfx} Discord Version {Fore.YELLOW} {discord.__version__}", flush=True)
         print(f"{prfx} Python Version {Fore.YELLOW} {str(platform.python_version())}", flush=True)
         print(f"{prfx} Bot Version 0.1", flush=True)
-        print(f"{prfx} Slash CMDs Synced: {Fore.YELLOW + str(len(await self.tree.fetch_commands(guild=MY_GUILD)))} Commands", flush=True)
-        scheduler.add_job(send_due_reminders, 'interval', seconds=1, args=[self])
-        
-        scheduler.start()
+        print(f"{prfx} Slash CMDs Registered: {Fore.YELLOW + str(len(self.tree.get_commands(guild=MY_GUILD)))} Commands", flush=True)
+
+        reminder_dispatcher.resume()
 
 client = Client()
 client.run(config.botConfig["token"])
\ No newline at end of file
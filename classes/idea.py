@@ -1,7 +1,5 @@
 from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Table
 from base import Base
-from prefect_sqlalchemy import SqlAlchemyConnector
-from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 #from sqlalchemy import select, func
 from handlers.loki_logging import get_logger
@@ -11,7 +9,10 @@ from sqlalchemy import ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.future import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, func, literal_column, text, event, DDL, Index
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from utils.database import get_sessionmaker
 
 
 loki_logger = get_logger(
@@ -27,11 +28,49 @@ loki_logger = get_logger(
 
 # @future-schema idea_catcher
 
+# full-text document over title + content; the GIN index and the search query must use this exact expression
+SEARCH_DOCUMENT = "to_tsvector('simple'::regconfig, coalesce(title, '') || ' ' || coalesce(content, ''))"
+
+# name -> id, filled only after the transaction that resolved the name has committed
+_category_ids = {}
+_tag_ids = {}
+
+
+async def resolve_name_ids(session, model, names, cache: dict) -> dict:
+    """Map names to ids of `model` rows inside `session`'s transaction, creating missing rows.
+
+    Cached names cost nothing; the rest take one INSERT ... ON CONFLICT DO NOTHING RETURNING plus, for rows that
+    already existed (or were inserted concurrently), one SELECT. The caller merges the result into `cache` after commit.
+    """
+    resolved = {name: cache[name] for name in names if name in cache}
+    missing = sorted({name for name in names if name not in cache})
+    if not missing:
+        return resolved
+
+    dialect_insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+    result = await session.execute(
+        dialect_insert(model)
+        .values([{"name": name} for name in missing])
+        .on_conflict_do_nothing(index_elements=["name"])
+        .returning(model.id, model.name)
+    )
+    resolved.update({name: id_ for id_, name in result.all()})
+
+    existing = [name for name in missing if name not in resolved]
+    if existing:
+        result = await session.execute(select(model.id, model.name).where(model.name.in_(existing)))
+        resolved.update({name: id_ for id_, name in result.all()})
+
+    return resolved
+
+
 idea_tag_association = Table(
     'idea_tag_association',
     Base.metadata,
     Column('idea_id', Integer, ForeignKey('idea.id')),
-    Column('tag_id', Integer, ForeignKey('tag.id'))
+    Column('tag_id', Integer, ForeignKey('tag.id')),
+    Index('ix_idea_tag_association_tag_idea', 'tag_id', 'idea_id'),
+    Index('ix_idea_tag_association_idea', 'idea_id')
 )
 
 class Category(Base):
@@ -48,22 +87,14 @@ class Category(Base):
     @classmethod
     async def get_or_create(cls, name: str) -> "Category":
         """Get an existing Category by name or create a new one if it doesn't exist."""
-        connector = await SqlAlchemyConnector.load("spheredefaultasynccreds")
-        engine = connector.get_engine()
+        AsyncSessionLocal = await get_sessionmaker()
 
         try:
-            async with AsyncSession(engine) as session:
-                result = await session.execute(select(cls).where(cls.name == name))
-                existing = result.scalars().first()
-                if existing:
-                    return existing
-
-                new_category = cls(name=name)
-                session.add(new_category)
-                await session.commit()
-                await session.refresh(new_category)
-                loki_logger.info(f"Created new category: {new_category}")
-                return new_category
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    ids = await resolve_name_ids(session, cls, [name], _category_ids)
+                _category_ids.update(ids)
+                return await session.get(cls, ids[name])
 
         except SQLAlchemyError as e:
             loki_logger.error(f"Error during fetching or creating a category named '{name}': {e}")
@@ -88,22 +119,14 @@ class Tag(Base):
     @classmethod
     async def get_or_create(cls, name: str) -> "Tag":
         """Returns an existing tag or creates a new one."""
-        connector = await SqlAlchemyConnector.load("spheredefaultasynccreds")
-        engine = connector.get_engine()
+        AsyncSessionLocal = await get_sessionmaker()
 
         try:
-            async with AsyncSession(engine) as session:
-                result = await session.execute(select(cls).where(cls.name == name))
-                existing = result.scalars().first()
-                if existing:
-                    return existing
-
-                new_tag = cls(name=name)
-                session.add(new_tag)
-                await session.commit()
-                await session.refresh(new_tag)
-                loki_logger.info(f"Created new tag: {new_tag}")
-                return new_tag
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    ids = await resolve_name_ids(session, cls, [name], _tag_ids)
+                _tag_ids.update(ids)
+                return await session.get(cls, ids[name])
 
         except SQLAlchemyError as e:
             loki_logger.error(f"Error during fetching or creating a tag named '{name}': {e}")
@@ -135,22 +158,105 @@ class Idea(Base):
     pinned = Column(Boolean, nullable=False, default=False)
     source = Column(String, nullable=True)
 
+    __table_args__ = (
+        Index("ix_idea_search", text(SEARCH_DOCUMENT), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
     def __repr__(self):
         return f"<Idea(title={self.title})>"
+
+    @classmethod
+    def _matches(cls, dialect_name: str, query: str):
+        if dialect_name == "postgresql":
+            return literal_column(SEARCH_DOCUMENT).op("@@")(
+                func.websearch_to_tsquery(literal_column("'simple'::regconfig"), query)
+            )
+
+        # SQLite (tests/benchmarks): FTS5 shadow table kept in sync by triggers; every term is quoted literally
+        fts_query = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+        return cls.id.in_(
+            text("SELECT rowid FROM idea_fts WHERE idea_fts MATCH :fts_query").bindparams(fts_query=fts_query)
+        )
+
+    @classmethod
+    async def search(
+        cls,
+        query: str = None,
+        tags: list = (),
+        category: str = None,
+        after_id: int = None,
+        limit: int = 20,
+        include_archived: bool = False
+    ) -> tuple:
+        """Full-text search with tag/category filters, newest first.
+
+        Paginated by keyset: pass the returned cursor as `after_id` to get the next page. Returns (ideas, cursor),
+        where cursor is None on the last page. All given tags must be present on an idea.
+        """
+        AsyncSessionLocal = await get_sessionmaker()
+        try:
+            async with AsyncSessionLocal() as session:
+                stmt = select(cls)
+                if query:
+                    stmt = stmt.where(cls._matches(session.bind.dialect.name, query))
+                if category:
+                    stmt = stmt.join(Category, cls.category_id == Category.id).where(Category.name == category)
+                for tag_name in set(tags):
+                    stmt = stmt.where(
+                        select(idea_tag_association.c.idea_id)
+                        .join(Tag, Tag.id == idea_tag_association.c.tag_id)
+                        .where(idea_tag_association.c.idea_id == cls.id, Tag.name == tag_name)
+                        .exists()
+                    )
+                if not include_archived:
+                    stmt = stmt.where(cls.archived == False)
+                if after_id is not None:
+                    stmt = stmt.where(cls.id < after_id)
+
+                ideas = (await session.scalars(stmt.order_by(cls.id.desc()).limit(limit + 1))).all()
+        except SQLAlchemyError as e:
+            loki_logger.error(f"Error searching ideas for '{query}': {e}")
+            return [], None
+
+        cursor = ideas[limit - 1].id if len(ideas) > limit else None
+        return ideas[:limit], cursor
     
-    async def store_into_db(self) -> None:
-        """Store this idea in the database (async.)"""
-        from sqlalchemy.exc import SQLAlchemyError
-        connector = await SqlAlchemyConnector.load("spheredefaultcreds")
-        engine = connector.get_engine()
-        
-        Base.metadata.create_all(bind=engine) # dev purposes
-        
+    async def store_into_db(self, category_name: str, tag_names: list = ()) -> None:
+        """Store this idea with its category and tags in a single transaction (async)."""
+        AsyncSessionLocal = await get_sessionmaker()
+
         try:
-            with Session(engine) as session:
-                session.add(self)
-                session.commit()
-                session.close()
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    category_ids = await resolve_name_ids(session, Category, [category_name], _category_ids)
+                    tag_ids = await resolve_name_ids(session, Tag, tag_names, _tag_ids)
+
+                    self.category_id = category_ids[category_name]
+                    session.add(self)
+                    await session.flush()
+
+                    if tag_ids:
+                        await session.execute(
+                            insert(idea_tag_association).values(
+                                [{"idea_id": self.id, "tag_id": tag_id} for tag_id in tag_ids.values()]
+                            )
+                        )
+
+                _category_ids.update(category_ids)
+                _tag_ids.update(tag_ids)
                 loki_logger.info(f"Stored an idea into the database.")
         except SQLAlchemyError as e:
-            loki_logger.error(f"Failed to store idea: {e}")
\ No newline at end of file
+            loki_logger.error(f"Failed to store idea: {e}")
+
+
+for statement in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS idea_fts USING fts5(title, content, content='idea', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS idea_fts_insert AFTER INSERT ON idea BEGIN "
+    "INSERT INTO idea_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS idea_fts_delete AFTER DELETE ON idea BEGIN "
+    "INSERT INTO idea_fts(idea_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS idea_fts_update AFTER UPDATE ON idea BEGIN "
+    "INSERT INTO idea_fts(idea_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO idea_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+):
+    event.listen(Idea.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -1,15 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
 from base import Base
-from datetime import datetime, timezone
-from prefect_sqlalchemy import SqlAlchemyConnector
-from sqlalchemy.orm import Session
-from sqlalchemy import select, func
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import select, func, update, insert, delete, any_, literal, or_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
 from handlers.loki_logging import get_logger
 
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import sessionmaker
-
+from utils.database import get_sessionmaker
 from utils.send_push_notification import send_notification_to_ntfy
+from handlers.reminder_dispatcher import reminder_dispatcher
+from handlers.reminder_cache import reminder_list_cache
+from utils.recurrence import next_occurrence
 
 from sqlalchemy.orm import relationship
 
@@ -38,24 +38,59 @@ class Reminder(Base):
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     sent = Column(Boolean, default=False)
     list_id = Column(Integer, nullable=False, default=0)
+    # delivery lease: which bot instance is sending this reminder and until when others must keep their hands off
+    claimed_by = Column(String, nullable=True)
+    claim_expires_at = Column(DateTime(timezone=True), nullable=True)
+    # recurring reminders: one row per series, advanced in place after each delivery (see advance_recurring)
+    recurrence = Column(String, nullable=True)
+    recurrence_timezone = Column(String, nullable=True)
+    occurrences_left = Column(Integer, nullable=True)
     idea = relationship("Idea", back_populates="reminder", uselist=False)
 
+    __table_args__ = (
+        # due-reminder poll: only unsent rows are indexed, so the index does not grow with history
+        Index(
+            "ix_reminders_pending_remind_at",
+            remind_at,
+            postgresql_where=(sent == False),
+            sqlite_where=(sent == False),
+        ),
+        # per-user listing and list_id allocation
+        Index("ix_reminders_user_sent_list_id", discord_user_id, sent, list_id),
+    )
+
     def __repr__(self):
         return f"<Reminder(user_id={self.user_id}, remind_at={self.remind_at}, sent={self.sent})>"
 
     @classmethod
-    def load_from_input(cls, discord_user_id: int, message: str, remind_at: datetime):
-        return cls(discord_user_id=str(discord_user_id), message=message, remind_at=remind_at)
+    def load_from_input(
+        cls,
+        discord_user_id: int,
+        message: str,
+        remind_at: datetime,
+        recurrence: str = None,
+        recurrence_timezone: str = None,
+        occurrences_left: int = None
+    ):
+        return cls(
+            discord_user_id=str(discord_user_id),
+            message=message,
+            remind_at=remind_at,
+            recurrence=recurrence,
+            recurrence_timezone=recurrence_timezone,
+            occurrences_left=occurrences_left
+        )
     
     @classmethod
-    async def _load_due_reminders(cls, *selectables, filters=None, group_by=None, order_by=None, return_scalar=False):
-        """Internal helper to load reminders with optional filters and scalar option."""
-        connector = await SqlAlchemyConnector.load("spheredefaultasynccreds")
-        async_engine = connector.get_engine()
-        AsyncSessionLocal = sessionmaker(
-            bind=async_engine,
-            class_=AsyncSession,
-        )
+    async def _load_due_reminders(
+        cls, *selectables, filters=None, group_by=None, order_by=None, return_scalar=False, raise_errors=False
+    ):
+        """Internal helper to load reminders with optional filters and scalar option.
+
+        Errors are logged and an empty result is returned unless `raise_errors` is set, for callers that must tell a
+        failed query apart from no rows.
+        """
+        AsyncSessionLocal = await get_sessionmaker()
         try:
             async with AsyncSessionLocal() as session:
                 stmt = select(*selectables)
@@ -73,6 +108,8 @@ class Reminder(Base):
                 return result.scalars().all()
         except Exception as e:
             loki_logger.error(f"Error loading due reminders with filters {filters}: {e}")
+            if raise_errors:
+                raise
             return None if return_scalar else []
 
 
@@ -96,11 +133,33 @@ class Reminder(Base):
         if user_id:
             filters.append(cls.discord_user_id == str(user_id))
         
-        await cls._load_due_reminders(
+        return await cls._load_due_reminders(
             cls,
             filters=filters,
-            order_by=(cls.remind_at.desc(),), 
-            group_by=(cls.list_id)
+            order_by=(cls.remind_at.asc(), cls.list_id.asc())
+        )
+
+    @classmethod
+    async def load_pending_for_user(cls, user_id) -> list:
+        """Pending reminders of a user ordered by due time, served from the per-user cache when possible."""
+        reminders = reminder_list_cache.get(user_id)
+        if reminders is None:
+            generation = reminder_list_cache.generation(user_id)
+            reminders = await cls.load_due_reminders_ordered_by_due_time(user_id=user_id)
+            reminder_list_cache.set(user_id, reminders, generation=generation)
+        return reminders
+
+    @classmethod
+    async def load_pending_remind_times(cls, until: datetime) -> list:
+        """Load the next delivery attempt time of unsent reminders due up to `until` (used to seed the dispatcher).
+
+        Rows leased by another instance are reported at their lease expiry, so they are retried if that instance died.
+        Raises if the query fails, so the dispatcher keeps its heap instead of replacing it with nothing.
+        """
+        return await cls._load_due_reminders(
+            func.coalesce(cls.claim_expires_at, cls.remind_at),
+            filters=(cls.sent == False, cls.remind_at <= until),
+            raise_errors=True
         )
 
     @classmethod
@@ -114,60 +173,343 @@ class Reminder(Base):
         return (max_id or 0) + 1
 
 
-    def is_due(self) -> bool:
-        """Check if this reminder is due (synchronous)."""
-        from sqlalchemy.exc import SQLAlchemyError
-        try:
-            connector = SqlAlchemyConnector.load("spheredefaultasynccreds")
-            engine = connector.get_engine()
-            with Session(engine) as session:
-                result = session.execute(
-                    select(self.remind_at)
-                    .where(self.id == self.id, self.sent == False)
-                )
-                session.close()
-                
-                remind_at = result.scalar_one_or_none()
-                if remind_at is None:
-                    return False
-                return datetime.now(timezone.utc) >= remind_at
-        except SQLAlchemyError as e:
-            loki_logger.error(f"Database error while checking is_due: {e}")
+    async def is_due(self) -> bool:
+        """Check if this reminder is due (async)."""
+        remind_at = await self.__class__._load_due_reminders(
+            self.__class__.remind_at,
+            filters=(self.__class__.id == self.id, self.__class__.sent == False),
+            return_scalar=True
+        )
+        if remind_at is None:
             return False
+        return datetime.now(timezone.utc) >= remind_at
+
+    @classmethod
+    async def _lock_list_ids(cls, session, user_ids) -> None:
+        """Serialize list_id allocation per user for the rest of the transaction (Postgres advisory locks)."""
+        if session.bind.dialect.name != "postgresql":
+            return
+        for user_id in sorted(set(user_ids)):
+            await session.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"reminders:{user_id}"))))
+
+    def _insert_values(self) -> dict:
+        return {
+            "discord_user_id": self.discord_user_id,
+            "channel_id": self.channel_id,
+            "guild_id": self.guild_id,
+            "message": self.message,
+            "remind_at": self.remind_at,
+            "recurrence": self.recurrence,
+            "recurrence_timezone": self.recurrence_timezone,
+            "occurrences_left": self.occurrences_left,
+        }
 
     async def store_into_db(self) -> None:
-        """Store this reminder into the database (async)."""
+        """Store this reminder into the database (async), allocating its list_id in the same INSERT."""
         from sqlalchemy.exc import SQLAlchemyError
-        connector = await SqlAlchemyConnector.load("spheredefaultcreds")
-        engine = connector.get_engine()
-        
-        #self.list_id = await self.__class__.get_max_list_id_from_user(user_id=self.discord_user_id) + 1
-        
-        self.list_id = await self.__class__.get_next_list_id_for_user(user_id=self.discord_user_id)
-        
-        #Base.metadata.create_all(bind=engine) # dev purposes
+        cls = self.__class__
+        AsyncSessionLocal = await get_sessionmaker()
+
+        next_list_id = (
+            select(func.coalesce(func.max(cls.list_id), 0) + 1)
+            .where(cls.discord_user_id == self.discord_user_id, cls.sent == False)
+            .scalar_subquery()
+        )
+        stmt = (
+            insert(cls)
+            .values(**self._insert_values(), list_id=next_list_id)
+            .returning(cls.id, cls.list_id)
+        )
+
         try:
-            with Session(engine) as session:
-                session.add(self)
-                session.commit()
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    await cls._lock_list_ids(session, [self.discord_user_id])
+                    self.id, self.list_id = (await session.execute(stmt)).one()
                 loki_logger.info(f"Stored a reminder into the database.")
+            reminder_list_cache.invalidate(self.discord_user_id)
+            reminder_dispatcher.schedule(self.remind_at)
         except SQLAlchemyError as e:
             loki_logger.error(f"Failed to store reminder: {e}")
 
-    async def mark_as_sent(self) -> None:
-        """Mark this reminder as sent in the database (async)."""
-        # from sqlalchemy.exc import SQLAlchemyError
+    @classmethod
+    async def bulk_store_into_db(cls, reminders: list) -> list:
+        """Store many reminders in one transaction with a single multi-row INSERT; returns the stored reminders."""
+        from sqlalchemy.exc import SQLAlchemyError
+        if not reminders:
+            return []
+
+        AsyncSessionLocal = await get_sessionmaker()
+        user_ids = {reminder.discord_user_id for reminder in reminders}
+
+        try:
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    await cls._lock_list_ids(session, user_ids)
+
+                    result = await session.execute(
+                        select(cls.discord_user_id, func.max(cls.list_id))
+                        .where(cls.discord_user_id.in_(user_ids), cls.sent == False)
+                        .group_by(cls.discord_user_id)
+                    )
+                    last_list_ids = dict(result.all())
+
+                    rows = []
+                    for reminder in reminders:
+                        list_id = (last_list_ids.get(reminder.discord_user_id) or 0) + 1
+                        last_list_ids[reminder.discord_user_id] = list_id
+                        rows.append({**reminder._insert_values(), "list_id": list_id})
+
+                    result = await session.execute(
+                        insert(cls).values(rows).returning(cls.id, cls.discord_user_id, cls.list_id)
+                    )
+                    ids = {(user_id, list_id): reminder_id for reminder_id, user_id, list_id in result.all()}
+                    for reminder, row in zip(reminders, rows):
+                        reminder.id, reminder.list_id = ids[(reminder.discord_user_id, row["list_id"])], row["list_id"]
+                loki_logger.info(f"Stored {len(reminders)} reminders into the database.")
+        except SQLAlchemyError as e:
+            loki_logger.error(f"Failed to bulk store reminders: {e}")
+            return []
+
+        for user_id in user_ids:
+            reminder_list_cache.invalidate(user_id)
+        for reminder in reminders:
+            reminder_dispatcher.schedule(reminder.remind_at)
+        return reminders
+
+    @classmethod
+    def _id_in(cls, dialect_name: str, ids: list):
+        # one array parameter on Postgres keeps the statement text (and asyncpg's prepared statement) stable
+        if dialect_name == "postgresql":
+            return cls.id == any_(literal(list(ids), ARRAY(Integer)))
+        return cls.id.in_(list(ids))
+
+    @classmethod
+    async def claim_due(cls, instance_id: str, lease: timedelta, limit: int = 200) -> list:
+        """Lease up to `limit` due reminders to `instance_id` and return them.
+
+        Uses SELECT ... FOR UPDATE SKIP LOCKED on Postgres so concurrent instances claim disjoint batches; rows under
+        another instance's unexpired lease are skipped, expired leases (crashed instance) are taken over.
+        """
+        now = datetime.now(timezone.utc)
+        claimable = (
+            select(cls.id)
+            .where(
+                cls.sent == False,
+                cls.remind_at <= now,
+                or_(cls.claim_expires_at.is_(None), cls.claim_expires_at < now)
+            )
+            .order_by(cls.remind_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(cls)
+            .where(cls.id.in_(claimable.scalar_subquery()))
+            .values(claimed_by=instance_id, claim_expires_at=now + lease)
+            .returning(cls)
+        )
+
+        AsyncSessionLocal = await get_sessionmaker()
         try:
-            connector = await SqlAlchemyConnector.load("spheredefaultasynccreds")
-            async_engine = connector.get_engine()
-            async with AsyncSession(async_engine) as session:
+            async with AsyncSessionLocal() as session:
                 async with session.begin():
-                    db_reminder = await session.get(Reminder, self.id)
-                    if db_reminder:
-                        db_reminder.sent = True
+                    result = await session.scalars(stmt, execution_options={"synchronize_session": False})
+                    return result.all()
         except Exception as e:
-            loki_logger.error(f"Error marking reminder as sent: {e}")
-            
-    
+            loki_logger.error(f"Error claiming due reminders for {instance_id}: {e}")
+            return []
+
+    @classmethod
+    async def _update_unsent(cls, ids: list, instance_id: str = None, invalidate: bool = True, **values) -> list:
+        """Apply `values` to every listed reminder that is still unsent, in one UPDATE; returns the changed ids.
+
+        With `instance_id` only rows still leased to that instance are changed, so an instance whose lease was taken
+        over cannot ack or release the new owner's claim.
+        """
+        if not ids:
+            return []
+
+        filters = [cls.sent == False]
+        if instance_id is not None:
+            filters.append(cls.claimed_by == instance_id)
+
+        AsyncSessionLocal = await get_sessionmaker()
+        try:
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    result = await session.execute(
+                        update(cls)
+                        .where(cls._id_in(session.bind.dialect.name, ids), *filters)
+                        .values(**values)
+                        .returning(cls.id, cls.discord_user_id)
+                    )
+                    rows = result.all()
+        except Exception as e:
+            loki_logger.error(f"Error updating {len(ids)} reminders with {values}: {e}")
+            return []
+
+        if invalidate:
+            for user_id in {user_id for _, user_id in rows}:
+                reminder_list_cache.invalidate(user_id)
+        return [reminder_id for reminder_id, _ in rows]
+
+    @classmethod
+    async def mark_many_as_sent(cls, ids: list, instance_id: str = None) -> list:
+        """Mark a batch of delivered reminders as sent with a single UPDATE; returns the ids this call changed."""
+        return await cls._update_unsent(ids, instance_id=instance_id, sent=True)
+
+    @classmethod
+    async def release_many(cls, ids: list, instance_id: str = None, retry_after: timedelta = timedelta(0)) -> list:
+        """Drop the lease on reminders whose delivery failed so any instance can retry them after `retry_after`.
+
+        The reminders stay parked (unclaimable) until then, so a batch that keeps failing is not claimed again in a loop.
+        The retry is scheduled on the dispatcher right away rather than waiting for the next reconcile.
+        """
+        retry_at = datetime.now(timezone.utc) + retry_after
+        released = await cls._update_unsent(ids, instance_id=instance_id, claimed_by=None, claim_expires_at=retry_at)
+        if released:
+            reminder_dispatcher.schedule(retry_at)
+        return released
+
+    @classmethod
+    async def renew_leases(cls, ids: list, instance_id: str, lease: timedelta) -> list:
+        """Extend this instance's lease on reminders it is still delivering; returns the ids it still holds."""
+        return await cls._update_unsent(
+            ids, instance_id=instance_id, invalidate=False, claim_expires_at=datetime.now(timezone.utc) + lease
+        )
+
+    def next_remind_at(self, now: datetime) -> datetime:
+        """The occurrence after the one just delivered, or None if this reminder does not repeat any more."""
+        if not self.recurrence or self.occurrences_left == 1:
+            return None
+
+        remind_at = self.remind_at if self.remind_at.tzinfo else self.remind_at.replace(tzinfo=timezone.utc)
+        # occurrences missed while the bot was down are skipped, not delivered in a burst
+        return next_occurrence(self.recurrence, self.recurrence_timezone or "UTC", anchor=remind_at, after=now)
+
+    @classmethod
+    async def advance_recurring(cls, reminders: list, instance_id: str = None) -> list:
+        """Move delivered recurring reminders to their next occurrence in place; finished series are marked sent.
+
+        Returns the ids of the reminders that were advanced. One executemany UPDATE covers the whole batch, and each
+        reminder costs a single next-occurrence computation however long its series has been running.
+        """
+        if not reminders:
+            return []
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for reminder in reminders:
+            try:
+                remind_at = reminder.next_remind_at(now)
+            except ValueError as e:
+                loki_logger.error(f"Invalid recurrence on reminder {reminder.id}, ending the series: {e}")
+                remind_at = None
+            rows.append({
+                "b_id": reminder.id,
+                "b_remind_at": remind_at or reminder.remind_at,
+                "b_sent": remind_at is None,
+                "b_occurrences_left": (
+                    reminder.occurrences_left - 1 if remind_at is not None and reminder.occurrences_left else
+                    reminder.occurrences_left
+                ),
+            })
+
+        table = cls.__table__
+        filters = [table.c.id == bindparam("b_id"), table.c.sent == False]
+        if instance_id is not None:
+            filters.append(table.c.claimed_by == instance_id)
+        stmt = (
+            update(table)
+            .where(*filters)
+            .values(
+                remind_at=bindparam("b_remind_at"),
+                sent=bindparam("b_sent"),
+                occurrences_left=bindparam("b_occurrences_left"),
+                claimed_by=None,
+                claim_expires_at=None
+            )
+        )
+
+        AsyncSessionLocal = await get_sessionmaker()
+        try:
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    await session.execute(stmt, rows)
+        except Exception as e:
+            loki_logger.error(f"Error advancing {len(reminders)} recurring reminders: {e}")
+            return []
+
+        for user_id in {reminder.discord_user_id for reminder in reminders}:
+            reminder_list_cache.invalidate(user_id)
+        for row in rows:
+            if not row["b_sent"]:
+                reminder_dispatcher.schedule(row["b_remind_at"])
+        return [row["b_id"] for row in rows if not row["b_sent"]]
+
+    async def mark_as_sent(self) -> None:
+        """Mark this reminder as sent in the database (async)."""
+        await self.__class__.mark_many_as_sent([self.id])
+
+    @classmethod
+    async def archive_sent(cls, older_than: timedelta = timedelta(days=30), batch_size: int = 5000) -> int:
+        """Move sent reminders older than `older_than` into `reminders_archive`; returns the number of moved rows."""
+        from sqlalchemy.exc import SQLAlchemyError
+        AsyncSessionLocal = await get_sessionmaker()
+        cutoff = datetime.now(timezone.utc) - older_than
+        columns = [c.name for c in ReminderArchive.__table__.columns if c.name != "archived_at"]
+
+        filters = [cls.sent == True, cls.remind_at < cutoff]
+        idea_table = Base.metadata.tables.get("idea")
+        if idea_table is not None:
+            # rows still referenced by an idea stay in the hot table
+            filters.append(cls.id.not_in(select(idea_table.c.reminder_id).where(idea_table.c.reminder_id.is_not(None))))
+
+        moved = 0
+        try:
+            while True:
+                async with AsyncSessionLocal() as session:
+                    async with session.begin():
+                        ids = (await session.execute(select(cls.id).where(*filters).limit(batch_size))).scalars().all()
+                        if not ids:
+                            break
+
+                        await session.execute(
+                            insert(ReminderArchive).from_select(
+                                columns,
+                                select(*[getattr(cls, name) for name in columns]).where(cls.id.in_(ids))
+                            )
+                        )
+                        await session.execute(delete(cls).where(cls.id.in_(ids)))
+                moved += len(ids)
+                if len(ids) < batch_size:
+                    break
+        except SQLAlchemyError as e:
+            loki_logger.error(f"Failed to archive sent reminders: {e}")
+
+        if moved:
+            loki_logger.info(f"Archived {moved} sent reminders older than {cutoff}")
+        return moved
+
     async def send_push_notification(self):
-        send_notification_to_ntfy(ntfy_topic="/reminder_system", message=self.message)
\ No newline at end of file
+        await send_notification_to_ntfy(ntfy_topic="/reminder_system", message=self.message)
+
+
+class ReminderArchive(Base):
+    """Cold storage for delivered reminders, kept out of the hot `reminders` table."""
+    __tablename__ = 'reminders_archive'
+
+    id = Column(Integer, primary_key=True)
+    discord_user_id = Column(String, nullable=False, index=True)
+    channel_id = Column(String, nullable=True)
+    guild_id = Column(String, nullable=True)
+    message = Column(String, nullable=False)
+    remind_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    sent = Column(Boolean, default=True)
+    list_id = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ReminderArchive(id={self.id}, remind_at={self.remind_at})>"
@@ -3,7 +3,7 @@ from discord import app_commands
 from discord.ext import commands
 from config import botConfig, config
 
-from classes.idea import Idea, Tag, Category
+from classes.idea import Idea
 from handlers.loki_logging import get_logger
 
 
@@ -23,18 +23,32 @@ class IdeaGroup(app_commands.Group):
     @app_commands.command(description="Create and add an idea")
     async def save(self, interaction: discord.Interaction, input: str):
         idea = Idea()
-        tag = Tag()
-        category = Category()
-        
-        tag.name = "network"        # dev purposes
-        category.name = "tech"      # dev purposes
-        
         idea.title = input
-        idea.category = category
         
-        await idea.store_into_db()
+        await idea.store_into_db(
+            category_name="tech",       # dev purposes
+            tag_names=["network"]       # dev purposes
+        )
         
         await interaction.response.send_message(f"Added idea to the database")
+
+    @app_commands.command(description="Search your ideas by text, tag or category")
+    @app_commands.describe(
+        query="Words to look for in title and content",
+        tag="Only ideas with this tag",
+        category="Only ideas in this category",
+        after="Continue after this idea id (from the previous page)"
+    )
+    async def search(self, interaction: discord.Interaction, query: str = None, tag: str = None, category: str = None, after: int = None):
+        ideas, cursor = await Idea.search(query=query, tags=[tag] if tag else (), category=category, after_id=after)
+
+        if not ideas:
+            await interaction.response.send_message(f"No ideas found.", ephemeral=True)
+            return
+
+        lines = "\n".join(f"`#{idea.id}` {idea.title}" for idea in ideas)
+        more = f"\n\nMore results: use `after:{cursor}`" if cursor else ""
+        await interaction.response.send_message(f"Found {len(ideas)} idea(s).\n\n>>> {lines}{more}"[:2000], ephemeral=True)
         
         
 class IdeaCommand(commands.Cog):
@@ -1,11 +1,11 @@
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 from config import botConfig, config
-from prefect.blocks.system import Secret
-import dateparser
-from datetime import datetime, timezone
+from datetime import datetime
 from classes.reminder import Reminder
+from utils.time_parser import parse_time
+from utils.recurrence import parse_recurrence, next_occurrence
 from handlers.loki_logging import get_logger
 
 
@@ -22,74 +22,99 @@ loki_logger = get_logger(
 
 
 async def parse_time_naturally(text: str) -> datetime:
-    dt = dateparser.parse(text, settings={"PREFER_DATES_FROM": "future"})
-    if dt is None:
-        raise ValueError("Could not parse the time string.")
+    dt = parse_time(text)
     loki_logger.debug(f"parsed time from: '{text}' to '{dt}'")
-    return dt.astimezone(timezone.utc)
+    return dt
+
+# Discord rejects messages over 2000 characters
+MESSAGE_LIMIT = 2000
+LIST_HEADER = "Here's a list of your current ongoing reminders.\n\n>>> "
+LIST_FOOTER = "\n-# Page {page}/{pages}"
+
+
+async def transform_reminders(discord_user_id: str) -> list:
+    """Render the user's pending reminders into pages that each fit in one Discord message."""
+    reminders = await Reminder.load_pending_for_user(discord_user_id)
+
+    budget = MESSAGE_LIMIT - len(LIST_HEADER) - len(LIST_FOOTER.format(page=9999, pages=9999))
+    pages = []
+    current = ""
 
-async def send_due_reminders(self):
-    reminders = await Reminder.load_due_reminders()
-    for reminder in reminders:
-        try:
-            user = await self.fetch_user(reminder.discord_user_id)
-        except discord.NotFound:
-            print(f"User {reminder.discord_user_id} not found via fetch_user")
-            loki_logger.error(f"User {reminder.discord_user_id} not found via fetch_user")
-            user = None
-        except discord.HTTPException as e:
-            print(f"HTTP error fetching user {reminder.discord_user_id}: {e}")
-            loki_logger.error(f"HTTP error fetching user {reminder.discord_user_id}: {e}")
-            user = None
-
-        if user:
-            try:
-                await user.send(f"⏰ Reminder: {reminder.message}")
-                await reminder.send_push_notification()
-                await reminder.mark_as_sent()
-                loki_logger.info(f"Sent reminder to {user.name}")
-            except Exception as e:
-                print(f"Failed to send reminder to user {reminder.discord_user_id}: {e}")
-                loki_logger.error(f"Failed to send reminder to user {reminder.discord_user_id}: {e}")
-        else:
-            print(f"User {reminder.discord_user_id} could not be retrieved")
-            loki_logger.error(f"User {reminder.discord_user_id} could not be retrieved")
-
-async def transform_reminders(discord_user_id: str):
-    reminders = await Reminder.load_due_reminders_ordered_by_due_time(user_id=discord_user_id)
-    
-    reminder_list = f""
-    
     for reminder in reminders:
         try:
-            reminder_list += f"`#{reminder.list_id}` [<t:{int(reminder.remind_at.timestamp())}:R>]: {reminder.message}\n"
+            repeats = " 🔁" if reminder.recurrence else ""
+            line = f"`#{reminder.list_id}` [<t:{int(reminder.remind_at.timestamp())}:R>]{repeats}: {reminder.message}\n"
         except Exception as e:
             print(f"Failed to list reminders of the user [{reminder.discord_user_id}]: {e}")
             loki_logger.error(f"Failed to list reminders of the user [{reminder.discord_user_id}]: {e}")
-            
-    return reminder_list
+            continue
+
+        if len(line) > budget:
+            line = line[:budget - 2] + "…\n"
+        if current and len(current) + len(line) > budget:
+            pages.append(current)
+            current = ""
+        current += line
+
+    if current:
+        pages.append(current)
+    return pages
 
 class ReminderGroup(app_commands.Group):
     @app_commands.command(description="Remind yourself with a message.")
-    @app_commands.describe(time="When to remind (e.g. 'in 1h')", message="What to remind you about")
-    async def set(self, interaction: discord.Interaction, time: str, message: str):
-        remind_time = await parse_time_naturally(time)
+    @app_commands.describe(
+        time="When to remind (e.g. 'in 1h'); the first occurrence of a repeating reminder",
+        message="What to remind you about",
+        repeat="Repeat with a cron expression ('0 9 * * 1-5') or RRULE ('FREQ=WEEKLY;BYDAY=MO')",
+        tz_name="IANA timezone the repeat rule is evaluated in (e.g. 'Europe/Berlin')"
+    )
+    @app_commands.rename(tz_name="timezone")
+    async def set(self, interaction: discord.Interaction, time: str, message: str, repeat: str = None, tz_name: str = None):
+        try:
+            remind_time = await parse_time_naturally(time)
+        except (ValueError, OverflowError) as e:
+            await interaction.response.send_message(f"Could not understand the time `{time}`: {e}", ephemeral=True)
+            return
+        recurrence = count = None
+        tz_name = tz_name or config.get("DEFAULT_TIMEZONE", "UTC")
 
-        obj = Reminder.load_from_input(discord_user_id=interaction.user.id, message=message, remind_at=remind_time)
+        if repeat:
+            try:
+                recurrence, count = parse_recurrence(repeat, tz_name)
+                remind_time = next_occurrence(recurrence, tz_name, anchor=remind_time, inclusive=True)
+            except (ValueError, OverflowError) as e:
+                await interaction.response.send_message(f"Could not set a repeating reminder: {e}", ephemeral=True)
+                return
+            if remind_time is None:
+                await interaction.response.send_message("That repeat rule has no upcoming occurrences.", ephemeral=True)
+                return
+
+        obj = Reminder.load_from_input(
+            discord_user_id=interaction.user.id,
+            message=message,
+            remind_at=remind_time,
+            recurrence=recurrence,
+            recurrence_timezone=tz_name if recurrence else None,
+            occurrences_left=count
+        )
         await obj.store_into_db()
 
-        await interaction.response.send_message(f"⏰ Reminder `{message}` set for <t:{int(remind_time.timestamp())}:R>!", ephemeral=True)
+        repeats = f" (repeats `{repeat}`, {tz_name})" if recurrence else ""
+        await interaction.response.send_message(f"⏰ Reminder `{message}` set for <t:{int(remind_time.timestamp())}:R>{repeats}!", ephemeral=True)
 
 
     @app_commands.command(description="List current ongoing reminders.")
-    async def list(self, interaction: discord.Interaction):
-        message = await transform_reminders(discord_user_id=interaction.user.id)
+    @app_commands.describe(page="Page of the list to show")
+    async def list(self, interaction: discord.Interaction, page: app_commands.Range[int, 1] = 1):
+        pages = await transform_reminders(discord_user_id=interaction.user.id)
         
-        if message == "":
+        if not pages:
             await interaction.response.send_message(f"You have no ongoing reminders!")
             return
         
-        await interaction.response.send_message(f"Here's a list of your current ongoing reminders.\n\n>>> {message}")
+        page = min(page, len(pages))
+        footer = LIST_FOOTER.format(page=page, pages=len(pages)) if len(pages) > 1 else ""
+        await interaction.response.send_message(f"{LIST_HEADER}{pages[page - 1]}{footer}")
 
 
 class ReminderCommand(commands.Cog):
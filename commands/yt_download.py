@@ -2,9 +2,16 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from config import botConfig, config
-import pika
-import yt_dlp
-import os
+import asyncio
+import time
+from utils.yt_extractor import extract_info, iter_playlist_entries
+from utils.yt_cache import yt_info_cache, canonical_id
+from utils.rabbitmq_publisher import BufferFull
+from handlers import metrics
+
+
+# minimum seconds between edits of the playlist progress embed (Discord rate-limits message edits)
+PLAYLIST_PROGRESS_INTERVAL = 2
 
 
 class YtGroup(app_commands.Group):
@@ -12,37 +19,71 @@ class YtGroup(app_commands.Group):
     async def save(self, interaction: discord.Interaction, input: str):
         await interaction.response.defer()
 
-        connection = pika.BlockingConnection(pika.ConnectionParameters(host=config["RMQ_HOST"], port=config["RMQ_PORT"]))
-        channel = connection.channel()
-
-        channel.queue_declare(queue=config["RMQ_YT_DOWNLOAD_QUEUE"])
+        if canonical_id(input).startswith("playlist:"):
+            await save_playlist(interaction, url=input)
+            return
 
-        channel.basic_publish(exchange='',
-                    routing_key=config["RMQ_YT_DOWNLOAD_QUEUE"],
-                    body=input)
-
-        connection.close()
+        try:
+            await interaction.client.publisher.publish(config["RMQ_YT_DOWNLOAD_QUEUE"], input)
+        except BufferFull:
+            await interaction.followup.send("The download queue is unavailable right now, please try again later.")
+            return
 
         yt_info = await load_yt_info(url=input)
+        if yt_info is None:
+            await interaction.followup.send("Added to the queue, but the video info could not be loaded.")
+            return
+
         yt_embed = await create_info_embed(yt_info=yt_info)
 
         await interaction.followup.send(embed=yt_embed)
 
 
+async def save_playlist(interaction: discord.Interaction, url: str):
+    """Publish one download job per playlist entry as entries are extracted, updating the followup as we go."""
+    publisher = interaction.client.publisher
+    title = url
+    queued = 0
+
+    message = await interaction.followup.send(embed=await create_playlist_embed(title, queued, done=False), wait=True)
+    last_update = time.monotonic()
+
+    try:
+        async for kind, data in iter_playlist_entries(url):
+            if kind == "playlist":
+                title = data["title"] or url
+                continue
+
+            await publisher.publish(config["RMQ_YT_DOWNLOAD_QUEUE"], data["url"])
+            queued += 1
+
+            if time.monotonic() - last_update >= PLAYLIST_PROGRESS_INTERVAL:
+                await message.edit(embed=await create_playlist_embed(title, queued, done=False))
+                last_update = time.monotonic()
+    except BufferFull:
+        print(f"Stopped queueing playlist {url} after {queued} entries: the download queue is full")
+    except Exception as e:
+        print(f"Failed to extract playlist entries for {url}: {e}")
+
+    await message.edit(embed=await create_playlist_embed(title, queued, done=True))
+
+
 async def load_yt_info(url: str) -> dict:
+    """Return the embed fields for `url`, from the metadata cache when possible."""
     print(url)
-    cookie_file = config["YT_COOKIE_FILE"]
-    ydl_opts = {"quiet": True, "skip_download": True}
-
-    if os.path.exists(cookie_file):
-        ydl_opts['cookiefile'] = cookie_file
-    else:
-        print("Cookiefile not found.")
+    started = time.perf_counter()
+    cached = yt_info_cache.get(url)
+    if cached is not None:
+        metrics.yt_info_duration.observe(time.perf_counter() - started, source="cache")
+        return cached
 
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            return info
+        with metrics.yt_info_duration.time(source="extract"):
+            info = await extract_info(url)
+        return yt_info_cache.put(url, info)
+    except asyncio.TimeoutError:
+        print(f"Timed out extracting video info for {url}")
+        return
     except Exception as e:
         print(f"Failed to extract video info for {url}: {e}")
         return
@@ -54,6 +95,13 @@ async def create_info_embed(yt_info: dict):
 
     return embed
 
+async def create_playlist_embed(title: str, queued: int, done: bool):
+    embed = discord.Embed()
+    embed.title = f"Added {title} to the queue" if done else f"Adding {title} to the queue..."
+    embed.description = f"{queued} item(s) queued"
+
+    return embed
+
 class YouTubeDownload(commands.Cog):
         def __init__(self, client: commands.Bot):
             self.client = client
@@ -1,14 +1,63 @@
 import inspect
 import logging
+import sys
 
 
 class ContextFilter(logging.Filter):
+    """
+        Tags records with the calling function/method and its class.
+
+        By default the call site is taken from `record.funcName`/`record.pathname`, and the class name is
+        resolved once per call site from the code object's qualified name. Set `walk_frames=True` to fall
+        back to the old behaviour of walking the stack and inspecting `self`/`cls` in the caller's locals.
+    """
+
+    def __init__(self, walk_frames: bool = False):
+        super().__init__()
+        self.walk_frames = walk_frames
+        self._class_names = {}
+
     def filter(self, record):
+        if self.walk_frames:
+            method_name, class_name = self._context_from_frames()
+        else:
+            method_name = record.funcName
+            class_name = self._class_name_for(record)
+
+        tags = getattr(record, "tags", {})
+        tags.update({
+            "method" if class_name else "function": method_name,
+            **({"class": class_name} if class_name else {})
+        })
+        record.tags = tags
+
+        return True
+
+    def _class_name_for(self, record):
+        key = (record.pathname, record.lineno)
+        try:
+            return self._class_names[key]
+        except KeyError:
+            pass
+
+        class_name = None
+        frame = sys._getframe(1)
+        while frame:
+            code = frame.f_code
+            if code.co_filename == record.pathname and code.co_name == record.funcName:
+                class_name = _class_name_from_code(code)
+                break
+            frame = frame.f_back
+
+        self._class_names[key] = class_name
+        return class_name
+
+    def _context_from_frames(self):
         frame = inspect.currentframe()
         while frame:
             #co_name = frame.f_code.co_name
             filename = frame.f_code.co_filename
-            
+
             """
                 Dev Note:
                     update looping to exclude entire directories instead of having to list every file
@@ -28,7 +77,6 @@ class ContextFilter(logging.Filter):
         method_name = frame.f_code.co_name
         local_vars = frame.f_locals
 
-        is_method = "self" in local_vars or "cls" in local_vars
         class_name = None
 
         if "self" in local_vars:
@@ -36,11 +84,16 @@ class ContextFilter(logging.Filter):
         elif "cls" in local_vars:
             class_name = local_vars["cls"].__name__
 
-        tags = getattr(record, "tags", {})
-        tags.update({
-            "method" if is_method else "function": method_name,
-            **({"class": class_name} if class_name else {})
-        })
-        record.tags = tags
+        return method_name, class_name
+
+
+def _class_name_from_code(code):
+    """Derive the enclosing class from a code object's qualified name ('Reminder.store_into_db' -> 'Reminder')."""
+    qualname = getattr(code, "co_qualname", None)    # Python 3.11+
+    if not qualname:
+        return None
 
-        return True
\ No newline at end of file
+    owner = qualname.split(".")[:-1]
+    if not owner or owner[-1] == "<locals>":
+        return None
+    return owner[-1]
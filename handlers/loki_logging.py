@@ -1,64 +1,152 @@
 import logging
 import time
 import json
+import gzip
+import queue
 import threading
 import requests
-from prefect.variables import Variable
+from utils.prefect_config import prefect_config, VARIABLE
 from .filters import ContextFilter
 
-loki_json = Variable.get("lokiapiurl")
+LOKI_URL_VARIABLE = "lokiapiurl"
+prefect_config.register(LOKI_URL_VARIABLE, VARIABLE)
+
+_STOP = object()
 
 
 class LokiHandler(logging.Handler):
-    def __init__(self, url, labels=None, auth=None):
+    """
+        Queues records and ships them to Loki in batches from a single background worker.
+
+        Without an explicit `url` the push URL is read from the `lokiapiurl` Prefect variable on the first push, so
+        creating a logger never does network I/O.
+    """
+
+    def __init__(
+        self,
+        url=None,
+        labels=None,
+        auth=None,
+        batch_size=500,
+        flush_interval=1.0,
+        max_queue_size=10000,
+        compress=False,
+        timeout=5.0
+    ):
         super().__init__()
         self.url = url
         self.labels = labels or {}
         self.auth = auth
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.timeout = timeout
+
+        self.dropped = 0        # records rejected because the queue was full
+        self.failed = 0         # records lost because a push to Loki failed
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._session = requests.Session()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="loki-shipper", daemon=True)
+        self._worker.start()
 
     def emit(self, record):
         try:
-            log_entry = self.format(record)
-            timestamp_ns = str(int(time.time() * 1e9))  # nanoseconds
-
-            stream = {
-                "stream": {
-                    **self.labels,
-                    **getattr(record, "tags", {}),
-                    "level": record.levelname.lower(),
-                    "logger": record.name
-                },
-                "values": [[timestamp_ns, log_entry]]
+            labels = {
+                **self.labels,
+                **getattr(record, "tags", {}),
+                "level": record.levelname.lower(),
+                "logger": record.name
             }
+            entry = (tuple(sorted(labels.items())), str(time.time_ns()), self.format(record))
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
 
-            headers = {"Content-Type": "application/json"}
-            payload = {"streams": [stream]}
-
-            threading.Thread(
-                target=requests.post,
-                args=(self.url,),
-                kwargs={"data": json.dumps(payload), "headers": headers, "auth": self.auth},
-                daemon=True
-            ).start()
+    def close(self):
+        """Flush whatever is still queued and stop the worker (also run by logging.shutdown at exit)."""
+        if not self._closed:
+            self._closed = True
+            try:
+                self._queue.put(_STOP, timeout=self.timeout)
+            except queue.Full:
+                pass
+            self._worker.join(timeout=self.timeout)
+            self._session.close()
+        super().close()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._push(batch)
+                return
+            if item is not None:
+                batch.append(item)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._push(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _push(self, batch):
+        if not batch:
+            return
+
+        streams = {}
+        for labels, timestamp_ns, line in batch:
+            streams.setdefault(labels, []).append([timestamp_ns, line])
+
+        payload = {
+            "streams": [
+                {"stream": dict(labels), "values": values}
+                for labels, values in streams.items()
+            ]
+        }
 
+        try:
+            url = self.url or prefect_config.get(LOKI_URL_VARIABLE)["url"]
         except Exception:
-            self.handleError(record)
+            self.failed += len(batch)
+            return
 
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.compress:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+
+        try:
+            response = self._session.post(url, data=body, headers=headers, auth=self.auth, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            self.failed += len(batch)
 
 
 def get_logger(
     name: str,
     *,
-    url: str = loki_json["url"],
+    url: str = None,
     labels: dict = None,
     auth: tuple = None,
-    level: str = "info"
+    level: str = "info",
+    compress: bool = False
 ) -> logging.Logger:
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
 
     if not any(isinstance(h, LokiHandler) for h in logger.handlers):
-        handler = LokiHandler(url=url, labels=labels, auth=auth)
+        handler = LokiHandler(url=url, labels=labels, auth=auth, compress=compress)
         handler.setLevel(getattr(logging, level.upper(), logging.INFO))
 
         formatter = logging.Formatter(
@@ -0,0 +1,57 @@
+import time
+from collections import OrderedDict
+
+
+class ReminderListCache:
+    """
+        Pending reminders per user, kept so `/reminder list` does not need a database round trip.
+
+        Entries are invalidated whenever a user's reminders are stored or marked sent, expire after `ttl` seconds as a
+        safety net (e.g. rows changed by another bot instance), and at most `max_users` users are kept (LRU).
+
+        Every invalidation bumps the user's generation. A reader takes `generation(user_id)` before querying and
+        passes it to `set`, which skips the write if the user was invalidated meanwhile, so a list read before a
+        store or mark-sent is never cached after it.
+    """
+
+    def __init__(self, max_users: int = 1000, ttl: float = 300):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+
+    def get(self, user_id) -> list:
+        key = str(user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, reminders = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return reminders
+
+    def generation(self, user_id) -> int:
+        return self._generations.get(str(user_id), 0)
+
+    def set(self, user_id, reminders: list, generation: int = None) -> None:
+        key = str(user_id)
+        if generation is not None and generation != self._generations.get(key, 0):
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, list(reminders))
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id) -> None:
+        key = str(user_id)
+        self._entries.pop(key, None)
+        self._generations[key] = self._generations.get(key, 0) + 1
+
+
+reminder_list_cache = ReminderListCache()
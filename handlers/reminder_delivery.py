@@ -0,0 +1,182 @@
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timezone, timedelta
+
+import discord
+
+from config import config
+from classes.reminder import Reminder
+from handlers.loki_logging import get_logger
+from handlers import metrics
+from handlers.user_resolver import user_resolver
+
+
+loki_logger = get_logger(
+    "sphere.discord.python",
+    level="debug",
+    labels={
+        "app": "sphere",
+        "env": "dev",
+        "service": "discord_bot",
+        "lang": "python"
+    }
+)
+
+
+# identifies this bot process in reminder leases; must be unique per replica
+INSTANCE_ID = config.get("INSTANCE_ID") or f"{socket.gethostname()}:{os.getpid()}"
+# leases are renewed every third of this while a batch is being delivered (see keep_leased)
+CLAIM_LEASE = timedelta(seconds=int(config.get("REMINDER_CLAIM_LEASE_SECONDS", 120)))
+CLAIM_BATCH_SIZE = int(config.get("REMINDER_CLAIM_BATCH_SIZE", 200))
+# reminders that could not be delivered are parked this long before any instance claims them again
+RETRY_BACKOFF = timedelta(seconds=int(config.get("REMINDER_RETRY_BACKOFF_SECONDS", 60)))
+
+# DMs to one user share a Discord rate-limit bucket, so each user's reminders are sent in order
+# and only different users are delivered concurrently.
+delivery_semaphore = asyncio.Semaphore(int(config.get("REMINDER_DELIVERY_CONCURRENCY", 10)))
+# ntfy pushes of delivered reminders; they run outside the semaphore so the push coalesce window never holds a DM slot
+_push_tasks = set()
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def deliver_to_user(
+    client: discord.Client, discord_user_id: str, reminders: list, latencies: list, delivered: list, abandoned: list
+):
+    """
+        DM one user's reminders in order, appending each reminder whose DM went out to `delivered`. Reminders of a
+        user Discord does not know (deleted accounts) can never be delivered and are appended to `abandoned`.
+    """
+    async with delivery_semaphore:
+        try:
+            user = await user_resolver.get_user(client, discord_user_id)
+            if user is not None:
+                channel = await user_resolver.get_dm_channel(client, user)
+        except Exception as e:
+            # discord.py re-raises connection errors (OSError, ConnectionResetError) unwrapped; retried after a backoff
+            print(f"User {discord_user_id} could not be retrieved: {e}")
+            loki_logger.error(f"User {discord_user_id} could not be retrieved: {e}")
+            metrics.reminder_deliveries.inc(len(reminders), status="user_unavailable")
+            return
+
+        if user is None:
+            print(f"User {discord_user_id} does not exist any more, ending {len(reminders)} reminders")
+            loki_logger.warning(f"User {discord_user_id} does not exist any more, ending {len(reminders)} reminders")
+            metrics.reminder_deliveries.inc(len(reminders), status="user_unknown")
+            abandoned.extend(reminders)
+            return
+
+        for reminder in reminders:
+            started = time.perf_counter()
+            try:
+                with metrics.call_duration.time(service="discord", operation="send_dm"):
+                    await channel.send(f"⏰ Reminder: {reminder.message}")
+                delivered.append(reminder)
+                latencies.append(time.perf_counter() - started)
+
+                remind_at = reminder.remind_at if reminder.remind_at.tzinfo else reminder.remind_at.replace(tzinfo=timezone.utc)
+                metrics.reminder_delivery_lag.observe((datetime.now(timezone.utc) - remind_at).total_seconds())
+                metrics.reminder_deliveries.inc(status="sent")
+                loki_logger.info(f"Sent reminder to {user.name}")
+            except Exception as e:
+                metrics.reminder_deliveries.inc(status="failed")
+                if isinstance(e, discord.NotFound):
+                    user_resolver.invalidate(discord_user_id)    # stale DM channel, resolve it again next time
+                print(f"Failed to send reminder to user {reminder.discord_user_id}: {e}")
+                loki_logger.error(f"Failed to send reminder to user {reminder.discord_user_id}: {e}")
+
+
+async def push_delivered(reminders: list) -> None:
+    """Push already DMed reminders to ntfy; failures are only logged, the reminders stay acked."""
+    results = await asyncio.gather(*(reminder.send_push_notification() for reminder in reminders), return_exceptions=True)
+    for reminder, result in zip(reminders, results):
+        if isinstance(result, Exception):
+            print(f"Failed to send push notification for reminder {reminder.id}: {result}")
+            loki_logger.error(f"Failed to send push notification for reminder {reminder.id}: {result}")
+
+
+def start_pushes(reminders: list) -> None:
+    if not reminders:
+        return
+    task = asyncio.create_task(push_delivered(reminders))
+    _push_tasks.add(task)
+    task.add_done_callback(_push_tasks.discard)
+
+
+async def wait_for_pushes() -> None:
+    """Let pushes that are still running finish (shutdown, before the ntfy client is closed)."""
+    while _push_tasks:
+        await asyncio.gather(*list(_push_tasks))
+
+
+async def keep_leased(ids: list) -> None:
+    """Renew this instance's lease on a batch until cancelled, so slow deliveries are not taken over mid-send."""
+    while True:
+        await asyncio.sleep(CLAIM_LEASE.total_seconds() / 3)
+        held = await Reminder.renew_leases(ids, instance_id=INSTANCE_ID, lease=CLAIM_LEASE)
+        if len(held) < len(ids):
+            loki_logger.warning(f"Lost the lease on {len(ids) - len(held)} reminders while delivering them")
+
+
+async def send_due_reminders(client: discord.Client):
+    # each pass leases a batch to this instance; other replicas skip leased rows and take the next batch
+    while True:
+        reminders = await Reminder.claim_due(instance_id=INSTANCE_ID, lease=CLAIM_LEASE, limit=CLAIM_BATCH_SIZE)
+        if not reminders:
+            return
+        metrics.reminder_batch_size.observe(len(reminders))
+
+        reminders_by_user = {}
+        for reminder in reminders:
+            reminders_by_user.setdefault(reminder.discord_user_id, []).append(reminder)
+
+        latencies = []
+        delivered = []
+        abandoned = []
+        batch_started = time.perf_counter()
+        renewer = asyncio.create_task(keep_leased([reminder.id for reminder in reminders]))
+        try:
+            results = await asyncio.gather(*(
+                deliver_to_user(client, discord_user_id, user_reminders, latencies, delivered, abandoned)
+                for discord_user_id, user_reminders in reminders_by_user.items()
+            ), return_exceptions=True)
+            for discord_user_id, result in zip(reminders_by_user, results):
+                if isinstance(result, Exception):
+                    print(f"Delivery to user {discord_user_id} failed: {result}")
+                    loki_logger.error(f"Delivery to user {discord_user_id} failed: {result}")
+        finally:
+            renewer.cancel()
+            # whatever went out is acked even if the batch was interrupted, so it is never sent twice; reminders
+            # of deleted users end (including their series), everything else is released for a retry after a backoff
+            finished_ids = {reminder.id for reminder in delivered + abandoned}
+            await Reminder.mark_many_as_sent(
+                [reminder.id for reminder in delivered if not reminder.recurrence] + [reminder.id for reminder in abandoned],
+                instance_id=INSTANCE_ID
+            )
+            await Reminder.advance_recurring(
+                [reminder for reminder in delivered if reminder.recurrence], instance_id=INSTANCE_ID
+            )
+            await Reminder.release_many(
+                [reminder.id for reminder in reminders if reminder.id not in finished_ids],
+                instance_id=INSTANCE_ID,
+                retry_after=RETRY_BACKOFF
+            )
+
+        start_pushes(delivered)
+
+        if latencies:
+            latencies.sort()
+            loki_logger.info(
+                f"Delivered {len(latencies)}/{len(reminders)} reminders in {time.perf_counter() - batch_started:.3f}s "
+                f"(p50={percentile(latencies, 50):.3f}s p95={percentile(latencies, 95):.3f}s p99={percentile(latencies, 99):.3f}s)"
+            )
+
+        # released reminders are parked until their backoff ends, so the next pass claims reminders not tried yet
+        if len(reminders) < CLAIM_BATCH_SIZE:
+            return
@@ -0,0 +1,121 @@
+import asyncio
+import heapq
+from datetime import datetime, timezone, timedelta
+
+from handlers.loki_logging import get_logger
+
+
+loki_logger = get_logger(
+    "sphere.discord.python",
+    level="debug",
+    labels={
+        "app": "sphere",
+        "env": "dev",
+        "service": "discord_bot",
+        "lang": "python",
+    }
+)
+
+
+class ReminderDispatcher:
+    """Keeps upcoming remind_at values in a min-heap and sleeps until the earliest one is due."""
+
+    def __init__(self, reconcile_interval: int = 300):
+        self.reconcile_interval = reconcile_interval
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._task = None
+        self._scheduled_during_reconcile = None
+        self._deliver = None
+        self._load_pending = None
+
+    def schedule(self, remind_at: datetime) -> None:
+        """Register a deadline and wake the dispatcher if it is the new earliest one."""
+        if remind_at.tzinfo is None:
+            remind_at = remind_at.replace(tzinfo=timezone.utc)
+
+        if self._scheduled_during_reconcile is not None:
+            self._scheduled_during_reconcile.append(remind_at)
+
+        heapq.heappush(self._heap, remind_at)
+        if self._heap[0] == remind_at:
+            self._wakeup.set()
+
+    async def reconcile(self) -> None:
+        """Rebuild the heap from the database (startup and slow interval only)."""
+        if self._load_pending is None:
+            return
+
+        horizon = datetime.now(timezone.utc) + timedelta(seconds=self.reconcile_interval)
+        # deadlines scheduled while the query runs may be missing from its snapshot; they are replayed below
+        self._scheduled_during_reconcile = []
+        try:
+            remind_times = await self._load_pending(until=horizon)
+            scheduled = self._scheduled_during_reconcile
+        except Exception as e:
+            # the heap still holds every deadline scheduled so far; the next reconcile tries again
+            loki_logger.error(f"Failed to reconcile reminder dispatcher, keeping {len(self._heap)} deadlines: {e}")
+            return
+        finally:
+            self._scheduled_during_reconcile = None
+
+        self._heap = [
+            t if t.tzinfo else t.replace(tzinfo=timezone.utc)
+            for t in remind_times
+        ] + scheduled
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+        loki_logger.debug(f"Reconciled reminder dispatcher with {len(self._heap)} upcoming reminders")
+
+    def start(self, deliver, load_pending) -> None:
+        """Start the dispatch loop; `deliver` runs once per due deadline, `load_pending(until=...)` feeds reconcile."""
+        self._deliver = deliver
+        self._load_pending = load_pending
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def pause(self) -> None:
+        """Hold deliveries (e.g. while the gateway is down); deadlines keep accumulating in the heap."""
+        self._resumed.clear()
+
+    def resume(self) -> None:
+        self._resumed.set()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        await self.reconcile()
+
+        while True:
+            now = datetime.now(timezone.utc)
+
+            if self._heap and self._heap[0] <= now:
+                await self._resumed.wait()
+                now = datetime.now(timezone.utc)
+                while self._heap and self._heap[0] <= now:
+                    heapq.heappop(self._heap)
+                try:
+                    await self._deliver()
+                except Exception as e:
+                    loki_logger.error(f"Reminder delivery failed in dispatcher: {e}")
+                continue
+
+            timeout = (self._heap[0] - now).total_seconds() if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+reminder_dispatcher = ReminderDispatcher()
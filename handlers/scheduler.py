@@ -0,0 +1,111 @@
+import time
+import functools
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MISSED
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.base import STATE_STOPPED
+
+from handlers import metrics
+from handlers.loki_logging import get_logger
+
+
+loki_logger = get_logger(
+    "sphere.discord.python",
+    level="debug",
+    labels={
+        "app": "sphere",
+        "env": "dev",
+        "service": "discord_bot",
+        "lang": "python",
+    }
+)
+
+scheduler = AsyncIOScheduler()
+
+
+class JobStats:
+    """Run durations and missed/failed run counts of one scheduled job."""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.missed = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+
+    def record(self, duration: float) -> None:
+        self.runs += 1
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.total_duration += duration
+
+    def as_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "missed": self.missed,
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+            "avg_duration": self.total_duration / self.runs if self.runs else 0.0,
+        }
+
+
+job_stats = {}
+
+metrics.registry.gauge(
+    "sphere_scheduler_job_missed_runs", "Runs skipped because a job was still running or the loop was blocked.",
+    lambda: {(job_id, ): stats.missed for job_id, stats in job_stats.items()},
+    ("job",)
+)
+
+
+def timed(job_id: str, func):
+    """Wrap a coroutine function so every run's duration is recorded under `job_id`."""
+    stats = job_stats.setdefault(job_id, JobStats())
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            stats.failures += 1
+            status = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            stats.record(duration)
+            metrics.job_duration.observe(duration, job=job_id, status=status)
+
+    return wrapper
+
+
+def _on_job_event(event) -> None:
+    if event.code == EVENT_JOB_MISSED:
+        job_stats.setdefault(event.job_id, JobStats()).missed += 1
+        loki_logger.warning(f"Scheduled job {event.job_id} missed its run at {event.scheduled_run_time}")
+    else:
+        loki_logger.error(f"Scheduled job {event.job_id} failed: {event.exception}")
+
+
+def register_job(job_id: str, func, trigger: str, **trigger_args) -> None:
+    """Register a job under a stable id; re-registering (e.g. after a reconnect) replaces it instead of duplicating it."""
+    scheduler.add_job(
+        timed(job_id, func),
+        trigger,
+        id=job_id,
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=60,
+        **trigger_args
+    )
+
+
+def start() -> None:
+    if scheduler.state == STATE_STOPPED:
+        scheduler.add_listener(_on_job_event, EVENT_JOB_ERROR | EVENT_JOB_MISSED)
+        scheduler.start()
+
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import discord
+
+from config import config
+from handlers import metrics
+
+
+_lookups = metrics.registry.counter(
+    "sphere_user_lookups_total", "User lookups by where they were answered from.", ("source",)
+)
+
+
+class UserResolver:
+    """
+        Resolves Discord user ids to users and their DM channels with as few REST calls as possible.
+
+        Lookups go to the gateway cache first, then a bounded TTL cache of users and DM channels, and only then to
+        `fetch_user`. Concurrent lookups of one id share a single request, and unknown (e.g. deleted) users are
+        remembered for `negative_ttl` seconds so they are not fetched again on every delivery.
+    """
+
+    def __init__(self, max_users: int = 5000, ttl: float = 3600, negative_ttl: float = 600):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    async def get_user(self, client: discord.Client, user_id):
+        """The user, or None if Discord does not know the id; other HTTP errors propagate and are not cached."""
+        key = int(user_id)
+
+        user = client.get_user(key)
+        if user is not None:
+            _lookups.inc(source="gateway")
+            return user
+
+        entry = self._get_entry(key)
+        if entry is not None:
+            _lookups.inc(source="negative" if entry[1] is None else "cache")
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._fetch(client, key))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            _lookups.inc(source="shared")
+        return await asyncio.shield(task)
+
+    async def get_dm_channel(self, client: discord.Client, user: discord.abc.User) -> discord.DMChannel:
+        """The DM channel with `user`, created over REST once and then reused."""
+        entry = self._get_entry(user.id)
+        if entry is not None and entry[2] is not None:
+            return entry[2]
+
+        channel = user.dm_channel
+        if channel is None:
+            with metrics.call_duration.time(service="discord", operation="create_dm"):
+                channel = await user.create_dm()
+        self._set(user.id, user, channel, self.ttl)
+        return channel
+
+    def invalidate(self, user_id) -> None:
+        self._entries.pop(int(user_id), None)
+
+    async def _fetch(self, client: discord.Client, key: int):
+        _lookups.inc(source="rest")
+        try:
+            with metrics.call_duration.time(service="discord", operation="fetch_user"):
+                user = await client.fetch_user(key)
+        except discord.NotFound:
+            self._set(key, None, None, self.negative_ttl)
+            return None
+
+        self._set(key, user, None, self.ttl)
+        return user
+
+    def _get_entry(self, key: int):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def _set(self, key: int, user, channel, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, user, channel)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+
+user_resolver = UserResolver(
+    max_users=int(config.get("USER_CACHE_MAX_USERS", 5000)),
+    ttl=float(config.get("USER_CACHE_TTL_SECONDS", 3600)),
+    negative_ttl=float(config.get("USER_CACHE_NEGATIVE_TTL_SECONDS", 600))
+)
@@ -0,0 +1,26 @@
+-- Indexes for the due-reminder poll and per-user reminder queries (see Reminder.__table_args__).
+-- CONCURRENTLY avoids locking a large `reminders` table; run outside a transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_reminders_pending_remind_at
+    ON reminders (remind_at)
+    WHERE sent = false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_reminders_user_sent_list_id
+    ON reminders (discord_user_id, sent, list_id);
+
+-- Cold storage for delivered reminders (see Reminder.archive_sent).
+CREATE TABLE IF NOT EXISTS reminders_archive (
+    id INTEGER PRIMARY KEY,
+    discord_user_id VARCHAR NOT NULL,
+    channel_id VARCHAR,
+    guild_id VARCHAR,
+    message VARCHAR NOT NULL,
+    remind_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE,
+    sent BOOLEAN,
+    list_id INTEGER NOT NULL,
+    archived_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_reminders_archive_discord_user_id
+    ON reminders_archive (discord_user_id);
@@ -0,0 +1,4 @@
+-- Delivery leases for running several bot replicas (see Reminder.claim_due).
+
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS claimed_by VARCHAR;
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMP WITH TIME ZONE;
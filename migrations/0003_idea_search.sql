@@ -0,0 +1,13 @@
+-- Full-text index for Idea.search (see classes/idea.py SEARCH_DOCUMENT; the expression must match exactly).
+-- CONCURRENTLY avoids locking the `idea` table; run outside a transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_idea_search
+    ON idea
+    USING gin (to_tsvector('simple'::regconfig, coalesce(title, '') || ' ' || coalesce(content, '')));
+
+-- Tag filters look up the association table by tag and by idea.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_idea_tag_association_tag_idea
+    ON idea_tag_association (tag_id, idea_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_idea_tag_association_idea
+    ON idea_tag_association (idea_id);
@@ -0,0 +1,5 @@
+-- Recurring reminders (see Reminder.advance_recurring): a series stays one row whose remind_at moves forward.
+
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS recurrence VARCHAR;
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS recurrence_timezone VARCHAR;
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS occurrences_left INTEGER;
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from config import config
+from utils.prefect_config import prefect_config, CONNECTOR
+from handlers import metrics
+
+
+DEFAULT_CREDS_BLOCK = "spheredefaultasynccreds"
+prefect_config.register(DEFAULT_CREDS_BLOCK, CONNECTOR)
+
+_engines = {}
+_sessionmakers = {}
+_lock = asyncio.Lock()
+
+
+def _engine_options() -> dict:
+    return {
+        "pool_size": int(config.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(config.get("DB_MAX_OVERFLOW", 10)),
+        "pool_recycle": int(config.get("DB_POOL_RECYCLE_SECONDS", 1800)),
+        "pool_pre_ping": True,
+    }
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started", None)
+    if started is None:
+        return
+    operation = statement.lstrip()[:6].lower()
+    metrics.call_duration.observe(
+        time.perf_counter() - started,
+        service="db",
+        operation=operation if operation in ("select", "insert", "update", "delete") else "other"
+    )
+
+
+def _instrument(engine) -> None:
+    """Record every statement's latency; the listeners run on the sync engine the async one wraps."""
+    if not event.contains(engine.sync_engine, "before_cursor_execute", _before_execute):
+        event.listen(engine.sync_engine, "before_cursor_execute", _before_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", _after_execute)
+
+
+async def get_engine(block_name: str = DEFAULT_CREDS_BLOCK):
+    """Return the process-wide async engine for a credential block, creating it on first use."""
+    engine = _engines.get(block_name)
+    if engine is not None:
+        return engine
+
+    async with _lock:
+        engine = _engines.get(block_name)
+        if engine is None:
+            connection = await prefect_config.aget(block_name, CONNECTOR)
+            engine = create_async_engine(
+                connection["url"],
+                connect_args=connection["connect_args"],
+                **_engine_options()
+            )
+            _instrument(engine)
+            _engines[block_name] = engine
+            _sessionmakers[block_name] = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    return engine
+
+
+async def get_sessionmaker(block_name: str = DEFAULT_CREDS_BLOCK) -> async_sessionmaker:
+    """Return the shared `async_sessionmaker` bound to the pooled engine of a credential block."""
+    if block_name not in _sessionmakers:
+        await get_engine(block_name)
+    return _sessionmakers[block_name]
+
+
+def use_engine(engine, block_name: str = DEFAULT_CREDS_BLOCK) -> None:
+    """Install an already created async engine for a block instead of loading it from Prefect (benchmarks, load tests)."""
+    _instrument(engine)
+    _engines[block_name] = engine
+    _sessionmakers[block_name] = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def dispose_engines() -> None:
+    """Close every pooled connection; called once on shutdown."""
+    for engine in _engines.values():
+        await engine.dispose()
+    _engines.clear()
+    _sessionmakers.clear()
+
+
+async def ensure_schema(metadata, block_name: str = DEFAULT_CREDS_BLOCK) -> None:
+    """Create missing tables and any indexes declared on existing tables (run once at startup)."""
+    engine = await get_engine(block_name)
+
+    def _create(connection):
+        metadata.create_all(connection, checkfirst=True)
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(_create)
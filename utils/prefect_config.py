@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+
+
+VARIABLE = "variable"
+SECRET = "secret"
+CONNECTOR = "connector"
+
+
+def _load_variable(name: str):
+    from prefect.variables import Variable
+    return Variable.get(name)
+
+
+def _load_secret(name: str):
+    from prefect.blocks.system import Secret
+    return Secret.load(name).get()
+
+
+def _load_connector(name: str) -> dict:
+    """Only the rendered URL and connect args are kept, so the engine can be built from a snapshot as well."""
+    from prefect_sqlalchemy import SqlAlchemyConnector
+    from sqlalchemy.engine import make_url
+
+    connector = SqlAlchemyConnector.load(name)
+    info = connector.connection_info
+    url = info.create_url() if hasattr(info, "create_url") else make_url(str(info))
+    return {
+        "url": url.render_as_string(hide_password=False),
+        "connect_args": dict(connector.connect_args or {}),
+    }
+
+
+_LOADERS = {
+    VARIABLE: _load_variable,
+    SECRET: _load_secret,
+    CONNECTOR: _load_connector,
+}
+
+
+class PrefectConfig:
+    """
+        Prefect variables, secrets and SqlAlchemyConnector blocks, resolved once and served from memory.
+
+        Modules `register` the blocks they need at import time (no I/O) and read them lazily with `get`/`aget`.
+        `load` fetches every registered block concurrently at startup and `refresh`, run by the scheduler every `ttl`
+        seconds, re-fetches all of them. After every successful load the values are written to a Fernet-encrypted snapshot, which is used
+        instead of failing whenever Prefect cannot be reached.
+    """
+
+    def __init__(self, ttl: float = 900, snapshot_path: str = None, snapshot_key: str = None, max_workers: int = 8):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.snapshot_key = snapshot_key
+
+        self._kinds = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefect-config")
+
+    def register(self, name: str, kind: str) -> None:
+        if kind not in _LOADERS:
+            raise ValueError(f"Unknown Prefect block kind: {kind}")
+        self._kinds.setdefault(name, kind)
+
+    async def load(self, names=None) -> None:
+        """Fetch the given (default: all registered) blocks concurrently; failures fall back to the snapshot."""
+        names = list(names or self._kinds)
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self._pool, self._fetch, name) for name in names),
+            return_exceptions=True
+        )
+
+        failed = [name for name, result in zip(names, results) if isinstance(result, BaseException)]
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                print(f"Failed to load Prefect block {name}: {result}")
+
+        if failed:
+            self._restore(failed)
+        if len(failed) < len(names):
+            await loop.run_in_executor(self._pool, self._write_snapshot)
+
+    async def refresh(self) -> None:
+        """
+            Re-fetch every registered block; the cached values keep being served if Prefect is unreachable.
+
+            Deliberately unconditional: the job already runs once per TTL, and skipping blocks "younger than the TTL"
+            would skip every block fetched by the previous tick, doubling the effective TTL.
+        """
+        await self.load()
+
+    def get(self, name: str, kind: str = None):
+        """
+            Cached value of a block. On a miss the block is fetched on the config pool (never on the calling thread,
+            since Prefect's sync API misbehaves inside a running event loop), falling back to the snapshot.
+        """
+        if name in self._values:
+            return self._values[name]
+
+        if kind is not None:
+            self.register(name, kind)
+        try:
+            return self._pool.submit(self._fetch, name).result()
+        except Exception as e:
+            print(f"Failed to load Prefect block {name}: {e}")
+            self._restore([name])
+            if name not in self._values:
+                raise
+            return self._values[name]
+
+    async def aget(self, name: str, kind: str = None):
+        if name in self._values:
+            return self._values[name]
+
+        if kind is not None:
+            self.register(name, kind)
+        await self.load([name])
+        if name not in self._values:
+            raise LookupError(f"Prefect block {name} is unavailable and not in the local snapshot")
+        return self._values[name]
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+    def _fetch(self, name: str):
+        value = _LOADERS[self._kinds[name]](name)
+        with self._lock:
+            self._values[name] = value
+        return value
+
+    def _fernet(self):
+        if not self.snapshot_path or not self.snapshot_key:
+            return None
+        from cryptography.fernet import Fernet    # only needed when a snapshot is configured
+        return Fernet(self.snapshot_key)
+
+    def _write_snapshot(self) -> None:
+        try:
+            fernet = self._fernet()
+            if fernet is None:
+                return
+            with self._lock:
+                payload = json.dumps(self._values, default=str).encode("utf-8")
+
+            temp_path = f"{self.snapshot_path}.tmp"
+            with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+                f.write(fernet.encrypt(payload))
+            os.replace(temp_path, self.snapshot_path)
+        except Exception as e:
+            print(f"Failed to write Prefect config snapshot: {e}")
+
+    def _restore(self, names: list) -> None:
+        try:
+            fernet = self._fernet()
+            if fernet is None or not os.path.exists(self.snapshot_path):
+                return
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = json.loads(fernet.decrypt(f.read()))
+        except Exception as e:
+            print(f"Failed to read Prefect config snapshot: {e}")
+            return
+
+        with self._lock:
+            for name in names:
+                # the next refresh retries Prefect and replaces a restored value
+                if name not in self._values and name in snapshot:
+                    self._values[name] = snapshot[name]
+                    print(f"Using snapshot value for Prefect block {name}")
+
+
+prefect_config = PrefectConfig(
+    ttl=float(config.get("PREFECT_CONFIG_TTL_SECONDS", 900)),
+    snapshot_path=config.get("PREFECT_CONFIG_SNAPSHOT_PATH", ".prefect_config_snapshot"),
+    snapshot_key=config.get("PREFECT_CONFIG_SNAPSHOT_KEY") or os.environ.get("PREFECT_CONFIG_SNAPSHOT_KEY"),
+)
@@ -0,0 +1,130 @@
+import asyncio
+from collections import deque
+
+from handlers import metrics
+
+
+class BufferFull(Exception):
+    """Raised by `RabbitPublisher.publish` when the broker is unreachable and the local buffer has no room left."""
+
+
+class RabbitPublisher:
+    """
+        Long-lived AMQP publisher started once from `Client.setup_hook`.
+
+        Keeps one robust connection and a confirm-mode channel, declares its queues once (aio_pika re-declares them
+        after a reconnect), and buffers messages locally while the broker is unreachable. The buffer is drained in
+        order as soon as publishing works again. Once `buffer_size` messages are waiting, new ones are refused with
+        `BufferFull` (and counted in `rejected`) rather than dropping queued jobs. `connect` can be swapped for an
+        in-process fake broker.
+    """
+
+    def __init__(self, queues: list, buffer_size: int = 1000, connect=None, **connection_kwargs):
+        self.queues = list(queues)
+        self.connection_kwargs = connection_kwargs
+        self._connect = connect
+
+        self.buffer_size = buffer_size
+        self.rejected = 0           # messages refused because the buffer was full
+        self._buffer = deque()
+        self._connection = None
+        self._channel = None
+        self._connect_task = None
+        self._drain_task = None
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    async def start(self) -> None:
+        if self._connect_task is None:
+            self._connect_task = asyncio.create_task(self._connect_loop())
+
+    async def close(self) -> None:
+        for task in (self._connect_task, self._drain_task):
+            if task is not None and not task.done():
+                task.cancel()
+        if self._connection is not None:
+            await self._connection.close()
+        self._connection = self._channel = None
+        self._connect_task = self._drain_task = None
+
+    async def publish(self, queue: str, body: str) -> bool:
+        """Publish `body` to `queue`; returns True once the broker confirmed it, False if it was buffered instead."""
+        if self._channel is None or self._buffer:
+            self._enqueue(queue, body)
+            return False
+
+        try:
+            await self._send(queue, body)
+            return True
+        except Exception as e:
+            print(f"Failed to publish to {queue}, buffering message: {e}")
+            self._enqueue(queue, body)
+            return False
+
+    def _enqueue(self, queue: str, body: str) -> None:
+        if len(self._buffer) >= self.buffer_size:
+            self.rejected += 1
+            print(f"RabbitMQ buffer full ({self.buffer_size} messages), refusing message for {queue}")
+            raise BufferFull(f"{self.buffer_size} messages are already waiting for the broker")
+
+        self._buffer.append((queue, body))
+        self._schedule_drain()
+
+    async def _send(self, queue: str, body: str) -> None:
+        import aio_pika
+        with metrics.call_duration.time(service="rabbitmq", operation="publish"):
+            await self._channel.default_exchange.publish(
+                aio_pika.Message(body=body.encode("utf-8")),
+                routing_key=queue
+            )
+
+    async def _connect_loop(self) -> None:
+        if self._connect is None:
+            import aio_pika    # deferred so importing the bot does not pull in the AMQP stack
+            self._connect = aio_pika.connect_robust
+
+        delay = 1
+        while True:
+            try:
+                self._connection = await self._connect(**self.connection_kwargs)
+                channel = await self._connection.channel(publisher_confirms=True)
+                for queue in self.queues:
+                    await channel.declare_queue(queue)
+                self._channel = channel
+                break
+            except Exception as e:
+                print(f"RabbitMQ unavailable, retrying in {delay}s: {e}")
+                await self._close_connection()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+        self._schedule_drain()
+
+    async def _close_connection(self) -> None:
+        """Close a connection whose channel or queue setup failed; a robust connection left open keeps reconnecting."""
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            await connection.close()
+        except Exception as e:
+            print(f"Failed to close RabbitMQ connection: {e}")
+
+    def _schedule_drain(self) -> None:
+        if self._channel is not None and self._buffer and (self._drain_task is None or self._drain_task.done()):
+            self._drain_task = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        delay = 1
+        while self._buffer:
+            queue, body = self._buffer[0]
+            try:
+                await self._send(queue, body)
+                self._buffer.popleft()
+                delay = 1
+            except Exception as e:
+                print(f"Still unable to publish buffered messages, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
@@ -0,0 +1,153 @@
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil.rrule import rrulestr
+
+from config import config
+
+
+_CRON = re.compile(r"^\S+(\s+\S+){4}$")
+_CRON_DAYS = ("SU", "MO", "TU", "WE", "TH", "FR", "SA")
+_CRON_FIELDS = (
+    # (name, minimum, maximum)
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day of month", 1, 31),
+    ("month", 1, 12),
+    ("day of week", 0, 7),
+)
+# every occurrence is a DM plus a claim/advance round trip, so users cannot repeat more often than this
+MIN_REPEAT_INTERVAL = int(config.get("REMINDER_MIN_REPEAT_SECONDS", 900))
+# consecutive occurrences sampled when checking the interval; enough to cover a year of any sparser rule
+_INTERVAL_SAMPLE = 500
+
+
+def get_zone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def _expand_cron_field(field: str, name: str, low: int, high: int) -> list:
+    values = set()
+    for part in field.split(","):
+        base, _, step = part.partition("/")
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(v) for v in base.split("-", 1))
+        else:
+            start = end = int(base)
+            if step:
+                end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron {name} out of range: {part}")
+        values.update(range(start, end + 1, int(step or 1)))
+    return sorted(values)
+
+
+def _cron_to_rrule(expression: str) -> str:
+    """Translate a 5-field cron expression into an equivalent daily RRULE."""
+    fields = expression.split()
+    try:
+        minutes, hours, days, months, weekdays = (
+            _expand_cron_field(field, *spec) for field, spec in zip(fields, _CRON_FIELDS)
+        )
+    except ValueError as e:
+        raise ValueError(f"Invalid cron expression '{expression}': {e}")
+
+    if fields[2] != "*" and fields[4] != "*":
+        # cron fires when EITHER field matches, which a single RRULE cannot express
+        raise ValueError("Cron expressions restricting both day of month and day of week are not supported")
+
+    parts = [
+        "FREQ=DAILY",
+        "BYHOUR=" + ",".join(map(str, hours)),
+        "BYMINUTE=" + ",".join(map(str, minutes)),
+        "BYSECOND=0",
+    ]
+    if fields[2] != "*":
+        parts.append("BYMONTHDAY=" + ",".join(map(str, days)))
+    if fields[3] != "*":
+        parts.append("BYMONTH=" + ",".join(map(str, months)))
+    if fields[4] != "*":
+        parts.append("BYDAY=" + ",".join(sorted({_CRON_DAYS[day % 7] for day in weekdays}, key=_CRON_DAYS.index)))
+    return ";".join(parts)
+
+
+@lru_cache(maxsize=1024)
+def _compile(rule: str):
+    return rrulestr(rule, dtstart=datetime(2000, 1, 1))
+
+
+def parse_recurrence(text: str, tz_name: str) -> tuple:
+    """
+        Normalize a cron expression or RRULE ('FREQ=WEEKLY;BYDAY=MO') into (rule, count).
+
+        COUNT is split off and returned separately because the series is re-anchored at every occurrence (see
+        `next_occurrence`), so the remaining count has to be tracked on the reminder. A UTC UNTIL is converted to the
+        reminder's wall-clock time, which is what the rule is evaluated in. Raises ValueError on invalid input,
+        including rules that repeat more often than MIN_REPEAT_INTERVAL seconds.
+    """
+    zone = get_zone(tz_name)
+    text = " ".join(text.strip().split())
+    if _CRON.match(text) and "=" not in text:
+        rule = _cron_to_rrule(text)
+        _check_interval(rule)
+        return rule, None
+
+    count = None
+    parts = []
+    for part in text.upper().removeprefix("RRULE:").split(";"):
+        key, _, value = part.partition("=")
+        if key == "FREQ" and value == "SECONDLY":
+            raise ValueError("Reminders cannot repeat every second")
+        if key == "COUNT":
+            count = int(value)
+            if count < 1:
+                raise ValueError("COUNT must be at least 1")
+            continue
+        if key == "UNTIL" and value.endswith("Z"):
+            until = datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+            value = until.astimezone(zone).strftime("%Y%m%dT%H%M%S")
+        parts.append(f"{key}={value}")
+
+    rule = ";".join(parts)
+    try:
+        _compile(rule)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid recurrence rule '{text}': {e}")
+    _check_interval(rule)
+    return rule, count
+
+
+def _check_interval(rule: str) -> None:
+    occurrences = list(islice(_compile(rule), _INTERVAL_SAMPLE))
+    shortest = min(
+        ((later - earlier).total_seconds() for earlier, later in zip(occurrences, occurrences[1:])),
+        default=None
+    )
+    if shortest is not None and shortest < MIN_REPEAT_INTERVAL:
+        raise ValueError(f"Reminders can repeat at most every {MIN_REPEAT_INTERVAL // 60} minutes")
+
+
+def next_occurrence(rule: str, tz_name: str, anchor: datetime, after: datetime = None, inclusive: bool = False) -> datetime:
+    """
+        The first occurrence of `rule` after `after` (default: `anchor`), or None once the series has ended.
+
+        The rule is evaluated in local wall-clock time of `tz_name` with the series anchored at `anchor`, an
+        occurrence itself, so each call only walks from the current occurrence to the next one no matter how long
+        the series has run. Occurrences keep their local time across DST changes.
+    """
+    zone = get_zone(tz_name)
+    local_anchor = anchor.astimezone(zone).replace(tzinfo=None)
+    local_after = max(local_anchor, (after or anchor).astimezone(zone).replace(tzinfo=None))
+
+    occurrence = _compile(rule).replace(dtstart=local_anchor).after(local_after, inc=inclusive)
+    if occurrence is None:
+        return None
+    return occurrence.replace(tzinfo=zone).astimezone(timezone.utc)
@@ -1,22 +1,172 @@
-import requests
-from requests.auth import HTTPBasicAuth
-from prefect.blocks.system import Secret
+import asyncio
+import random
 
+import aiohttp
 
-env_block = Secret.load("spheredefaultenv")
-env_data = env_block.get()
+from handlers import metrics
+from utils.prefect_config import prefect_config, SECRET
 
 
-def send_notification_to_ntfy(ntfy_topic: str, message: str):
-    ntfy_url = env_data["NTFY_URL"]
-    ntfy_auth = HTTPBasicAuth(env_data["HTTPBASICAUTH_USER"], env_data["HTTPBASICAUTH_PASSWORD"])
+ENV_SECRET = "spheredefaultenv"
+prefect_config.register(ENV_SECRET, SECRET)
 
-    try:
-        response = requests.post(
-            f"{ntfy_url}/{ntfy_topic}",
-            data=message,
-            auth=ntfy_auth
+
+class NtfyClient:
+    """
+        Async ntfy publisher on a pooled keep-alive session.
+
+        Failed pushes (connection errors, timeouts, 429 and 5xx) are retried with jittered exponential backoff.
+        Messages published to the same topic within `coalesce_window` seconds are sent as a single push. A batch is
+        sent early once it holds `max_batch_messages` messages or adding the next one would exceed `max_batch_bytes`,
+        which stays below ntfy's default 4 KB message limit (larger bodies become attachments or are rejected).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        auth: aiohttp.BasicAuth = None,
+        timeout: float = 10.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        coalesce_window: float = 0.25,
+        max_batch_messages: int = 20,
+        max_batch_bytes: int = 3584,
+        max_connections: int = 10
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.auth = auth
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.coalesce_window = coalesce_window
+        self.max_batch_messages = max_batch_messages
+        self.max_batch_bytes = max_batch_bytes
+        self.max_connections = max_connections
+
+        self._session = None
+        self._pending = {}          # topic -> (messages with their futures, body size in bytes)
+        self._flush_tasks = {}
+        self._send_tasks = set()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                auth=self.auth,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+            )
+        return self._session
+
+    async def publish(self, topic: str, message: str) -> bool:
+        """Send `message` to `topic`; returns whether ntfy accepted it."""
+        if self.coalesce_window <= 0:
+            return await self._post(topic, message)
+
+        size = len(message.encode("utf-8")) + 1    # plus the joining newline
+        pending = self._pending.get(topic)
+        if pending is not None and pending[1] + size > self.max_batch_bytes:
+            self._flush_now(topic)
+
+        future = asyncio.get_running_loop().create_future()
+        batch, batch_bytes = self._pending.setdefault(topic, ([], 0))
+        batch.append((message, future))
+        self._pending[topic] = (batch, batch_bytes + size)
+
+        if len(batch) >= self.max_batch_messages:
+            self._flush_now(topic)
+        elif topic not in self._flush_tasks:
+            self._flush_tasks[topic] = asyncio.create_task(self._flush_later(topic))
+
+        return await future
+
+    async def close(self) -> None:
+        for task in list(self._flush_tasks.values()):
+            await task
+        while self._send_tasks:
+            await asyncio.gather(*list(self._send_tasks))
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _flush_later(self, topic: str) -> None:
+        await asyncio.sleep(self.coalesce_window)
+        self._flush_tasks.pop(topic, None)
+        batch, _ = self._pending.pop(topic, ([], 0))
+        await self._send_batch(topic, batch)
+
+    def _flush_now(self, topic: str) -> None:
+        """Send the topic's pending batch right away instead of at the end of the coalesce window."""
+        timer = self._flush_tasks.pop(topic, None)
+        if timer is not None:
+            timer.cancel()
+        batch, _ = self._pending.pop(topic, ([], 0))
+
+        task = asyncio.create_task(self._send_batch(topic, batch))
+        self._send_tasks.add(task)
+        task.add_done_callback(self._send_tasks.discard)
+
+    async def _send_batch(self, topic: str, batch: list) -> None:
+        if not batch:
+            return
+
+        message = "\n".join(message for message, _ in batch)
+        accepted = await self._post(topic, message)
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(accepted)
+
+    async def _post(self, topic: str, message: str) -> bool:
+        with metrics.call_duration.time(service="ntfy", operation="publish"):
+            return await self._post_with_retries(topic, message)
+
+    async def _post_with_retries(self, topic: str, message: str) -> bool:
+        url = f"{self.base_url}/{topic.lstrip('/')}"
+        last_error = None
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._get_session().post(url, data=message.encode("utf-8")) as response:
+                    if response.status == 429 or response.status >= 500:
+                        last_error = f"HTTP {response.status}"
+                    else:
+                        response.raise_for_status()
+                        return True
+            except aiohttp.ClientResponseError as e:
+                print(f"Failed to send notification: {e}")
+                return False
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+
+            if attempt < self.retries:
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+        print(f"Failed to send notification after {self.retries + 1} attempts: {last_error}")
+        return False
+
+
+ntfy_client = None
+
+
+async def get_ntfy_client() -> NtfyClient:
+    """The shared client; its credentials are read without blocking the event loop, even on a cache miss."""
+    global ntfy_client
+    if ntfy_client is None:
+        env_data = await prefect_config.aget(ENV_SECRET)
+        if ntfy_client is not None:    # created by a concurrent caller while we were waiting
+            return ntfy_client
+        ntfy_client = NtfyClient(
+            base_url=env_data["NTFY_URL"],
+            auth=aiohttp.BasicAuth(env_data["HTTPBASICAUTH_USER"], env_data["HTTPBASICAUTH_PASSWORD"]),
         )
-        response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"Failed to send notification: {e}")
\ No newline at end of file
+    return ntfy_client
+
+
+async def send_notification_to_ntfy(ntfy_topic: str, message: str) -> bool:
+    client = await get_ntfy_client()
+    return await client.publish(ntfy_topic, message)
+
+
+async def close_ntfy_client() -> None:
+    if ntfy_client is not None:
+        await ntfy_client.close()
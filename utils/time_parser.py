@@ -0,0 +1,114 @@
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from config import config
+
+
+_UNITS = {
+    "s": "seconds", "sec": "seconds", "secs": "seconds", "second": "seconds", "seconds": "seconds",
+    "m": "minutes", "min": "minutes", "mins": "minutes", "minute": "minutes", "minutes": "minutes",
+    "h": "hours", "hr": "hours", "hrs": "hours", "hour": "hours", "hours": "hours",
+    "d": "days", "day": "days", "days": "days",
+    "w": "weeks", "wk": "weeks", "wks": "weeks", "week": "weeks", "weeks": "weeks",
+}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)\s*([a-z]+)")
+_RELATIVE = re.compile(r"^(?:in\s+)?\d+(?:\.\d+)?\s*[a-z]+(?:(?:\s*,\s*|\s+and\s+|\s+)?\d+(?:\.\d+)?\s*[a-z]+)*$")
+_DAY_TIME = re.compile(r"^(?:(today|tomorrow)\s*)?(?:(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)?)?$")
+
+_dateparser = None
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.strip().lower().split())
+
+
+@lru_cache(maxsize=1024)
+def _compile(normalized: str):
+    """
+        Turn a normalized input into a time-independent spec, or None if the fast path does not understand it.
+
+        Only the spec is cached, never the resulting datetime, since relative inputs depend on the current time.
+    """
+    if _RELATIVE.match(normalized):
+        parts = _DURATION_PART.findall(normalized)
+        # "9am"/"3pm" also look like durations; unknown units fall through to the clock-time forms below
+        if all(unit in _UNITS for _, unit in parts):
+            delta = sum((timedelta(**{_UNITS[unit]: float(amount)}) for amount, unit in parts), timedelta())
+            return ("delta", delta) if delta else None
+
+    match = _DAY_TIME.match(normalized)
+    if match and any(match.groups()):
+        day, hour, minute, meridiem = match.groups()
+        if hour is None:
+            # a bare "tomorrow" means the same time tomorrow, a bare "today" is too vague for the fast path
+            return ("delta", timedelta(days=1)) if day == "tomorrow" else None
+
+        hour, minute = int(hour), int(minute or 0)
+        if meridiem:
+            if not 1 <= hour <= 12:
+                return None
+            hour = hour % 12 + (12 if meridiem == "pm" else 0)
+        if hour > 23 or minute > 59:
+            return None
+        return ("day_time", day, hour, minute)
+
+    if normalized[:1].isdigit() and "-" in normalized:
+        try:
+            return ("absolute", datetime.fromisoformat(normalized.upper()))
+        except ValueError:
+            return None
+
+    return None
+
+
+def _resolve(spec, now: datetime) -> datetime:
+    kind = spec[0]
+    if kind == "delta":
+        return now + spec[1]
+
+    if kind == "day_time":
+        _, day, hour, minute = spec
+        result = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if day == "tomorrow":
+            result += timedelta(days=1)
+        elif day is None and result <= now:
+            # prefer the future, like dateparser's PREFER_DATES_FROM=future
+            result += timedelta(days=1)
+        return result
+
+    dt = spec[1]
+    return dt if dt.tzinfo else dt.astimezone()
+
+
+def _parse_with_dateparser(text: str) -> datetime:
+    global _dateparser
+    if _dateparser is None:
+        import dateparser
+        _dateparser = dateparser
+
+    return _dateparser.parse(
+        text,
+        languages=list(config.get("DATEPARSER_LANGUAGES", ["en"])),
+        settings={"PREFER_DATES_FROM": "future"}
+    )
+
+
+def parse_time(text: str, now: datetime = None) -> datetime:
+    """
+        Parse a reminder time ('in 1h', '30m', 'tomorrow 9am', ISO timestamps, ...) into an aware UTC datetime.
+
+        Common forms are handled by a cached fast path; anything else falls back to dateparser, which is imported on
+        first use and restricted to the configured DATEPARSER_LANGUAGES. Raises ValueError if neither understands it.
+    """
+    now = now or datetime.now().astimezone()
+
+    spec = _compile(_normalize(text))
+    if spec is not None:
+        return _resolve(spec, now).astimezone(timezone.utc)
+
+    dt = _parse_with_dateparser(text)
+    if dt is None:
+        raise ValueError("Could not parse the time string.")
+    return dt.astimezone(timezone.utc)
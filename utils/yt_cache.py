@@ -0,0 +1,154 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+from config import config
+from handlers import metrics
+
+
+# the only parts of a yt_dlp info dict that create_info_embed reads
+EMBED_FIELDS = ("title",)
+
+_YOUTUBE_HOSTS = {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com"}
+
+
+def canonical_id(url: str) -> str:
+    """
+        Map the different URL forms of one video/playlist to a single key.
+
+        youtu.be/<id>, youtube.com/watch?v=<id>, music.youtube.com/watch?v=<id>, /shorts/<id>, /embed/<id> and
+        /live/<id> become 'video:<id>'; anything carrying a list= parameter becomes 'playlist:<id>' (yt_dlp extracts
+        the playlist for those). Unrecognised URLs are used as-is.
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    query = parse_qs(parsed.query)
+
+    if "list" in query and (host in _YOUTUBE_HOSTS or host == "youtu.be"):
+        return f"playlist:{query['list'][0]}"
+
+    if host == "youtu.be":
+        video_id = parsed.path.lstrip("/").split("/")[0]
+        if video_id:
+            return f"video:{video_id}"
+
+    if host in _YOUTUBE_HOSTS:
+        if "v" in query:
+            return f"video:{query['v'][0]}"
+
+        parts = [part for part in parsed.path.split("/") if part]
+        if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+            return f"video:{parts[1]}"
+
+    return url.strip()
+
+
+class YtInfoCache:
+    """LRU + TTL cache of trimmed yt_dlp metadata, optionally persisted to SQLite so it survives restarts."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400, path: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_held = 0
+
+        self._entries = OrderedDict()   # key -> (expires_at, fields, size)
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS yt_info_cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, fields TEXT NOT NULL)"
+            )
+            self._db.execute("DELETE FROM yt_info_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "bytes_held": self.bytes_held,
+        }
+
+    def get(self, url: str) -> dict:
+        key = canonical_id(url)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._drop(key)
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT expires_at, fields FROM yt_info_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                self._remember(key, row[0], json.loads(row[1]))
+                self.hits += 1
+                return self._entries[key][1]
+
+        self.misses += 1
+        return None
+
+    def put(self, url: str, info: dict) -> dict:
+        """Cache the embed fields of a yt_dlp info dict and return them."""
+        key = canonical_id(url)
+        fields = {name: info.get(name) for name in EMBED_FIELDS}
+        expires_at = time.time() + self.ttl
+
+        self._remember(key, expires_at, fields)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO yt_info_cache (key, expires_at, fields) VALUES (?, ?, ?)",
+                (key, expires_at, json.dumps(fields))
+            )
+            self._db.commit()
+
+        return fields
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, expires_at: float, fields: dict) -> None:
+        if key in self._entries:
+            self._drop(key)
+
+        size = len(key) + len(json.dumps(fields))
+        self._entries[key] = (expires_at, fields, size)
+        self.bytes_held += size
+
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self.bytes_held -= size
+
+
+yt_info_cache = YtInfoCache(
+    max_entries=int(config.get("YT_CACHE_MAX_ENTRIES", 1024)),
+    ttl=float(config.get("YT_CACHE_TTL_SECONDS", 86400)),
+    path=config.get("YT_CACHE_PATH")
+)
+
+metrics.registry.gauge(
+    "sphere_yt_info_cache", "yt metadata cache entries, hits, misses, hit rate and bytes held.",
+    lambda: {(stat, ): value for stat, value in yt_info_cache.stats().items()},
+    ("stat",)
+)
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(config.get("YT_EXTRACT_WORKERS", 4)),
+    thread_name_prefix="yt-extract"
+)
+# playlist streaming holds a thread for the whole playlist, so it must not compete with single-video extraction
+_playlist_executor = ThreadPoolExecutor(
+    max_workers=int(config.get("YT_PLAYLIST_WORKERS", 2)),
+    thread_name_prefix="yt-playlist"
+)
+_local = threading.local()
+
+
+def _ydl_options() -> dict:
+    ydl_opts = {
+        "quiet": True,
+        "skip_download": True,
+        # bounds how long a worker thread can hang on a single request after the caller gave up
+        "socket_timeout": int(config.get("YT_SOCKET_TIMEOUT", 15)),
+    }
+
+    cookie_file = config["YT_COOKIE_FILE"]
+    if os.path.exists(cookie_file):
+        ydl_opts['cookiefile'] = cookie_file
+    else:
+        print("Cookiefile not found.")
+
+    return ydl_opts
+
+
+def _get_ydl(flat: bool = False):
+    """One YoutubeDL per worker thread (and mode); instances are reused across calls but never shared between threads."""
+    attr = "flat_ydl" if flat else "ydl"
+    ydl = getattr(_local, attr, None)
+    if ydl is None:
+        ydl_opts = _ydl_options()
+        if flat:
+            # playlist entries are only resolved to id/url/title, page by page
+            ydl_opts["extract_flat"] = "in_playlist"
+        import yt_dlp    # heavy import, deferred to the first extraction
+        ydl = yt_dlp.YoutubeDL(ydl_opts)
+        setattr(_local, attr, ydl)
+    return ydl
+
+
+def _extract(url: str) -> dict:
+    return _get_ydl().extract_info(url, download=False)
+
+
+async def extract_info(url: str, timeout: float = None) -> dict:
+    """Run yt_dlp metadata extraction in the worker pool; raises asyncio.TimeoutError after `timeout` seconds."""
+    if timeout is None:
+        timeout = float(config.get("YT_EXTRACT_TIMEOUT", 60))
+
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(_executor, _extract, url), timeout=timeout)
+
+
+def _entry_url(entry: dict) -> str:
+    return entry.get("webpage_url") or entry.get("url") or f"https://www.youtube.com/watch?v={entry['id']}"
+
+
+async def iter_playlist_entries(url: str, buffer_size: int = 50, timeout: float = None):
+    """
+        Lazily yield ('playlist', {...}) once, then ('entry', {...}) per playlist item as yt_dlp pages through it.
+
+        Extraction runs in a dedicated playlist pool and hands items over through a bounded queue, so memory stays
+        constant regardless of playlist length and the first entry is available as soon as the first page is fetched.
+        Raises asyncio.TimeoutError once the whole playlist has taken longer than `timeout` seconds.
+    """
+    if timeout is None:
+        timeout = float(config.get("YT_PLAYLIST_TIMEOUT", 600))
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    queue = asyncio.Queue(maxsize=buffer_size)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item) -> None:
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce() -> None:
+        try:
+            info = _get_ydl(flat=True).extract_info(url, download=False, process=False)
+            put(("playlist", {"title": info.get("title"), "id": info.get("id")}))
+
+            for entry in info.get("entries") or ():
+                if stopped.is_set():
+                    return
+                if entry:
+                    put(("entry", {"id": entry.get("id"), "title": entry.get("title"), "url": _entry_url(entry)}))
+        except Exception as e:
+            if not stopped.is_set():
+                put(e)
+        finally:
+            if not stopped.is_set():
+                put(done)
+
+    loop.run_in_executor(_playlist_executor, produce)
+
+    try:
+        while True:
+            item = await asyncio.wait_for(queue.get(), timeout=max(0.0, deadline - loop.time()))
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        # unblock a producer that is waiting on a full queue so it can notice `stopped`
+        while not queue.empty():
+            queue.get_nowait()
+
+
+def shutdown() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _playlist_executor.shutdown(wait=False, cancel_futures=True)